@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+"""
+Compares brocoli.buffers.read_views() to reading a new bytes object per chunk,
+hashing the data like transfers do.
+
+usage: python benchmarks/read_views.py [file [chunk size in MB]]
+
+Without a file, a 256 MB temporary file is used. read_views() is measured on
+its buffered path (memory maps disabled) and on its memory mapped path.
+Allocated memory is the sum, over chunks, of the memory allocated (as traced
+by tracemalloc) while reading a chunk. Requires Python >= 3.9.
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from brocoli import buffers
+
+
+def read_chunks(f, chunk_size):
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def hash_chunks(chunks, traced=False):
+    # returns the memory allocated while reading chunks when traced
+    h = hashlib.md5()
+    allocated = 0
+
+    chunks = iter(chunks)
+    while True:
+        if traced:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        chunk = next(chunks, None)
+
+        if traced:
+            # peak memory while producing the chunk
+            allocated += max(0, tracemalloc.get_traced_memory()[1] - before)
+
+        if chunk is None:
+            break
+
+        h.update(chunk)
+        del chunk
+
+    return allocated
+
+
+def measure(filename, reader, threshold):
+    saved_threshold = buffers.MMAP_THRESHOLD
+    buffers.MMAP_THRESHOLD = threshold
+    try:
+        # timed pass, without tracing overhead
+        with open(filename, 'rb') as f:
+            cpu = time.process_time()
+            hash_chunks(reader(f))
+            cpu = time.process_time() - cpu
+
+        tracemalloc.start()
+        try:
+            with open(filename, 'rb') as f:
+                allocated = hash_chunks(reader(f), traced=True)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    finally:
+        buffers.MMAP_THRESHOLD = saved_threshold
+
+    return cpu, allocated, peak
+
+
+def benchmark(filename, chunk_size):
+    size = os.path.getsize(filename)
+    gb = max(size, 1) / float(1 << 30)
+    mb = float(1 << 20)
+
+    never = float('inf')
+    readers = [
+        ('read()', lambda f: read_chunks(f, chunk_size), never),
+        ('buffered', lambda f: buffers.read_views(f, chunk_size), never),
+        ('mmap', lambda f: buffers.read_views(f, chunk_size), 0),
+    ]
+
+    for name, reader, threshold in readers:
+        cpu, allocated, peak = measure(filename, reader, threshold)
+        print('{:9} {:6.2f} CPU s/GB, {:9.1f} MB allocated, '
+              'peak {:7.1f} MB'.format(name, cpu / gb, allocated / mb,
+                                       peak / mb))
+
+
+def main():
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    chunk_size *= 1024 * 1024
+
+    if len(sys.argv) > 1:
+        benchmark(sys.argv[1], chunk_size)
+        return
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        block = os.urandom(1024 * 1024)
+        for _ in range(256):
+            tmp.write(block)
+        tmp.flush()
+
+        benchmark(tmp.name, chunk_size)
+
+
+if __name__ == '__main__':
+    main()
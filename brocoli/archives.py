@@ -0,0 +1,232 @@
+"""
+Streaming archive readers and writers, keeping memory bounded whatever the
+number of members
+"""
+
+import gzip
+import tarfile
+import time
+import zipfile
+
+# supported archive extensions and formats
+ARCHIVE_FORMATS = [
+    ('.tar.gz', 'tar.gz'),
+    ('.tgz', 'tar.gz'),
+    ('.tar', 'tar'),
+    ('.zip', 'zip'),
+]
+
+
+def archive_format(filename):
+    """
+    Returns the archive format matching filename extension or None
+    """
+    for ext, fmt in ARCHIVE_FORMATS:
+        if filename.lower().endswith(ext):
+            return fmt
+
+    return None
+
+
+class _TarMember(object):
+    # writes a member data to a TarWriter, padding it to whole blocks
+    def __init__(self, writer, size):
+        self.stream = writer
+        self.size = size
+        self.written = 0
+
+    def write(self, data):
+        self.stream.write(data)
+        self.written += len(data)
+
+    def close(self):
+        if self.written != self.size:
+            raise IOError('tar member size mismatch: {} bytes written, '
+                          '{} expected'.format(self.written, self.size))
+
+        remainder = self.size % tarfile.BLOCKSIZE
+        if remainder:
+            self.stream.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if args[0] is None:
+            self.close()
+
+
+class TarWriter(object):
+    """
+    Writes a (gzip compressed if compress is True) tar archive as a stream of
+    members, without keeping track of them like tarfile.TarFile does
+    """
+    def __init__(self, filename, compress=False):
+        self.fileobj = open(filename, 'wb')
+        self.stream = self.fileobj
+        if compress:
+            self.stream = gzip.GzipFile(fileobj=self.fileobj, mode='wb')
+
+        self.offset = 0
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def _header(self, name, size, mtime, type_):
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(mtime)
+        info.type = type_
+        info.mode = 0o755 if type_ == tarfile.DIRTYPE else 0o644
+
+        self._write(info.tobuf(tarfile.PAX_FORMAT, 'utf-8',
+                               'surrogateescape'))
+
+    def add_directory(self, name, mtime):
+        self._header(name, 0, mtime, tarfile.DIRTYPE)
+
+    def add_file(self, name, size, mtime):
+        """
+        Returns a writable member which must receive exactly size bytes before
+        being closed
+        """
+        self._header(name, size, mtime, tarfile.REGTYPE)
+
+        return _TarMember(self, size)
+
+    # members write through the writer to keep track of the offset
+    write = _write
+
+    def close(self):
+        # end of archive: two zero blocks, padded to a whole record
+        self._write(tarfile.NUL * (2 * tarfile.BLOCKSIZE))
+        remainder = self.offset % tarfile.RECORDSIZE
+        if remainder:
+            self._write(tarfile.NUL * (tarfile.RECORDSIZE - remainder))
+
+        if self.stream is not self.fileobj:
+            self.stream.close()
+        self.fileobj.close()
+
+
+class ZipWriter(object):
+    """
+    Writes a zip archive member by member. The zip central directory needs a
+    small record per member, kept in memory until the archive is closed.
+    """
+    def __init__(self, filename):
+        self.zipfile = zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED,
+                                       allowZip64=True)
+
+    def add_directory(self, name, mtime):
+        info = zipfile.ZipInfo(name.rstrip('/') + '/', _date_time(mtime))
+        info.external_attr = (0o40755 << 16) | 0x10
+        self.zipfile.writestr(info, b'')
+
+    def add_file(self, name, size, mtime):
+        """
+        Returns a writable member
+        """
+        info = zipfile.ZipInfo(name, _date_time(mtime))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o100644 << 16
+        info.file_size = size
+
+        return self.zipfile.open(info, 'w',
+                                 force_zip64=size >= zipfile.ZIP64_LIMIT)
+
+    def close(self):
+        self.zipfile.close()
+
+
+def _date_time(mtime):
+    # zip timestamps start in 1980
+    return max(time.gmtime(mtime)[:6], (1980, 1, 1, 0, 0, 0))
+
+
+def open_archive_writer(filename, fmt=None):
+    """
+    Returns an archive writer for filename, in fmt format (guessed from
+    filename extension by default)
+    """
+    fmt = fmt or archive_format(filename)
+
+    if fmt == 'tar':
+        return TarWriter(filename)
+    elif fmt == 'tar.gz':
+        return TarWriter(filename, compress=True)
+    elif fmt == 'zip':
+        return ZipWriter(filename)
+
+    raise ValueError('unsupported archive format: {}'.format(filename))
+
+
+def member_name(name):
+    """
+    Returns an archive member name relative to the extraction directory,
+    with '/' separators. Raises ValueError for names escaping it.
+    """
+    parts = [p for p in name.replace('\\', '/').split('/')
+             if p not in ('', '.')]
+    if '..' in parts:
+        raise ValueError('member name escapes the extraction directory')
+
+    return '/'.join(parts)
+
+
+def _safe_member_name(name, skipped):
+    # returns member_name(name), or None after appending (name, exception) to
+    # skipped if it is unsafe
+    try:
+        return member_name(name)
+    except ValueError as e:
+        skipped.append((name, e))
+        return None
+
+
+def archive_members(fileobj, skipped=None):
+    """
+    Generates (name, isdir, size, stream) tuples for the directories and
+    regular files of a tar (possibly compressed) or zip archive read from
+    binary file object fileobj. stream is None for directories, and is only
+    readable until the next member is requested.
+
+    Members whose name escapes the extraction directory are not generated:
+    (name, exception) pairs are appended to list skipped for them.
+
+    Tar archives are read sequentially, in a single pass.
+    """
+    if skipped is None:
+        skipped = []
+
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as z:
+            for info in z.infolist():
+                name = _safe_member_name(info.filename, skipped)
+                if name is None:
+                    continue
+
+                if info.filename.endswith('/'):
+                    yield name, True, 0, None
+                    continue
+
+                with z.open(info) as stream:
+                    yield name, False, info.file_size, stream
+        return
+
+    fileobj.seek(0)
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+        for info in tar:
+            if info.isdir() or info.isreg():
+                name = _safe_member_name(info.name, skipped)
+                if name is None:
+                    pass
+                elif info.isdir():
+                    yield name, True, 0, None
+                else:
+                    yield name, False, info.size, tar.extractfile(info)
+
+            # do not accumulate members like tarfile.TarFile does
+            tar.members = []
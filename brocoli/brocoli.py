@@ -71,14 +71,17 @@ class BrocoliApplication(object):
 
         self.menubar.add_cascade(label='Settings', menu=self.connection_menu)
 
-        self.menubar.add_command(label="Quit!", command=self.root.quit)
-
-        self.root.config(menu=self.menubar)
-
         # main window tree view, populate connection menu
         self.tree_widget = TreeWidget(self.root)
         self.tree_widget.grid(sticky='nsew')
 
+        self.menubar.add_command(label='Transfers',
+                                 command=self.tree_widget.show_transfers)
+
+        self.menubar.add_command(label="Quit!", command=self.root.quit)
+
+        self.root.config(menu=self.menubar)
+
         self.set_display_columns()
 
         self.connection_menu.add_command(label="New connection",
@@ -148,6 +151,9 @@ class BrocoliApplication(object):
         self.root.title(app_name)
 
     def cleanup(self):
+        self.tree_widget.stop_transfers()
+        self.tree_widget.stop_prefetch()
+
         if self.tree_widget.catalog is not None:
             self.tree_widget.catalog.close()
 
@@ -0,0 +1,98 @@
+"""
+Reading files by chunks without allocating a new buffer for each chunk
+"""
+
+import io
+import os
+import mmap
+import stat
+
+# local file reads larger than MMAP_THRESHOLD bytes are memory mapped
+MMAP_THRESHOLD = 32 * 1024 * 1024
+
+
+def _mapped_size(f, length):
+    # returns the number of bytes to read from f through a memory map, 0 when
+    # f is not a large enough local file
+    try:
+        st = os.fstat(f.fileno())
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        return 0
+
+    if not stat.S_ISREG(st.st_mode):
+        return 0
+
+    size = st.st_size - f.tell()
+    if length is not None:
+        size = min(size, length)
+
+    return size if size >= MMAP_THRESHOLD else 0
+
+
+def _buffered_views(f, chunk_size, length):
+    view = None
+
+    while length is None or length > 0:
+        size = chunk_size()
+        if length is not None:
+            size = min(size, length)
+
+        if view is None or len(view) < size:
+            view = memoryview(bytearray(size))
+
+        n = f.readinto(view[:size])
+        if not n:
+            break
+
+        yield view[:n]
+
+        if length is not None:
+            length -= n
+
+
+def _mapped_views(f, size, chunk_size):
+    offset = f.tell()
+    end = offset + size
+
+    m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(m)
+    try:
+        while offset < end:
+            chunk = view[offset:min(end, offset + chunk_size())]
+            n = len(chunk)
+            try:
+                yield chunk
+            finally:
+                # the map cannot be closed while views are exported
+                chunk.release()
+
+            offset += n
+    finally:
+        view.release()
+        m.close()
+
+        # leave f positioned as if it had been read
+        f.seek(offset)
+
+
+def read_views(f, chunk_size, length=None):
+    """
+    Reads file-like f (up to length bytes) by chunks of chunk_size bytes (an
+    integer or a callable returning the size of the next chunk).
+
+    Chunks are memoryview objects into a single reused buffer, or into a
+    memory map for large local files: a chunk is only valid until the next
+    one is requested and must not be kept.
+    """
+    if not callable(chunk_size):
+        fixed_size = chunk_size
+        chunk_size = lambda: fixed_size
+
+    mapped = _mapped_size(f, length)
+    if mapped:
+        views = _mapped_views(f, mapped, chunk_size)
+    else:
+        views = _buffered_views(f, chunk_size, length)
+
+    for view in views:
+        yield view
@@ -5,6 +5,9 @@ from collections import OrderedDict
 
 from six import print_
 
+from . import archives
+from . import exceptions
+
 
 class Catalog(object):
     """
@@ -26,6 +29,16 @@ class Catalog(object):
         """
         raise NotImplementedError
 
+    def listdir_pages(self, path, page_size=1000):
+        """
+        Generates directory contents (see listdir()) by dictionaries of at
+        most page_size entries, as they are retrieved. The default
+        implementation yields the whole listdir() result as a single page.
+        """
+        entries = self.listdir(path)
+        if entries:
+            yield entries
+
     def isdir(self, path):
         """
         Returns wether the specified path is a directory.
@@ -79,6 +92,21 @@ class Catalog(object):
         """
         raise NotImplementedError
 
+    def download_archive(self, pathlist, archive, osl):
+        """
+        Downloads directories contents into a local archive file (format
+        depends on its extension, see archives.archive_format()).
+        """
+        raise NotImplementedError
+
+    def sync_directories(self, pathlist, destdir, osl, delete_extra=False):
+        """
+        Downloads directories contents to local destdir, skipping files whose
+        local copy is up to date. Local files absent from the catalog are
+        deleted if delete_extra is True.
+        """
+        raise NotImplementedError
+
     def upload_files(self, files, path, osl):
         """
         Uploads local files to catalog destination path (a directory).
@@ -92,6 +120,20 @@ class Catalog(object):
         """
         raise NotImplementedError
 
+    def upload_archive(self, archive_files, path, osl):
+        """
+        Uploads the contents of local archive files to catalog destination
+        path (a directory), without extracting them locally.
+        """
+        raise NotImplementedError
+
+    def sync_upload_directories(self, dirs, path, osl):
+        """
+        Uploads local directories content to catalog destination path (a
+        directory), skipping files already present with the same contents.
+        """
+        raise NotImplementedError
+
     def delete_files(self, files, osl):
         """
         Deletes catalog files.
@@ -104,6 +146,31 @@ class Catalog(object):
         """
         raise NotImplementedError
 
+    def move_files(self, files, path, osl):
+        """
+        Moves catalog files to catalog destination path (a directory).
+        """
+        raise NotImplementedError
+
+    def move_directories(self, directories, path, osl):
+        """
+        Moves catalog directories to catalog destination path (a directory).
+        """
+        raise NotImplementedError
+
+    def copy_files(self, files, path, osl):
+        """
+        Copies catalog files to catalog destination path (a directory).
+        """
+        raise NotImplementedError
+
+    def copy_directories(self, directories, path, osl):
+        """
+        Recursively copies catalog directories to catalog destination path (a
+        directory).
+        """
+        raise NotImplementedError
+
     def mkdir(self, path):
         """
         Creates a new catalog directory.
@@ -122,6 +189,22 @@ class Catalog(object):
         """
         raise NotImplementedError
 
+    def prefetch(self, path, cancelled=None):
+        """
+        Retrieves the listing of directory path in advance, if the catalog
+        caches listings. cancelled is an optional callable, checked between
+        listing pages, returning True when the listing is no longer wanted.
+        Does nothing by default.
+        """
+        pass
+
+    def invalidate(self, path, recursive=False):
+        """
+        Discards cached information about path (and its sub-paths if
+        recursive is True), if any.
+        """
+        pass
+
     def close(self):
         pass
 
@@ -149,14 +232,28 @@ class OperationStatus(object):
 
         self.current_element = None
 
+        # elements being concurrently processed
+        self.current_elements = set()
+
     def in_progress(self, current_element):
         self.status = self.IN_PROGRESS
         self.current_element = current_element
 
+    def element_started(self, element):
+        """
+        Registers an element processed concurrently with others
+        """
+        self.status = self.IN_PROGRESS
+        self.current_elements.add(element)
+
+    def element_done(self, element):
+        self.current_elements.discard(element)
+
     def done(self):
         self.status = self.DONE
         self.progress = self.size
         self.current_element = None
+        self.current_elements.clear()
 
     def interrupt(self):
         if self.status not in (self.NEW, self.IN_PROGRESS):
@@ -165,6 +262,11 @@ class OperationStatus(object):
         if self.current_element is not None:
             self.cancel(self.current_element)
             self.current_element = None
+
+        for element in self.current_elements:
+            self.cancel(element)
+        self.current_elements.clear()
+
         self.status = self.INTERRUPTED
 
     def fail(self):
@@ -283,6 +385,74 @@ class OSCatalog(Catalog):
             i += 1
             yield i, number
 
+    def download_archive(self, pathlist, archive, osl):
+        number = len(pathlist)
+        for p in pathlist:
+            osl[p].size = 1
+
+        writer = archives.open_archive_writer(archive)
+        try:
+            i = 0
+            for path in pathlist:
+                osl[path].in_progress(None)
+
+                base = os.path.dirname(path)
+                for root, dirs, files in os.walk(path):
+                    member = os.path.relpath(root, base)
+                    writer.add_directory(member, os.path.getmtime(root))
+
+                    for f in files:
+                        f = os.path.join(root, f)
+                        with open(f, 'rb') as src, \
+                                writer.add_file(os.path.relpath(f, base),
+                                                os.path.getsize(f),
+                                                os.path.getmtime(f)) as m:
+                            shutil.copyfileobj(src, m)
+
+                osl[path].done()
+
+                i += 1
+                yield i, number
+        finally:
+            writer.close()
+
+    def sync_directories(self, pathlist, destdir, osl, delete_extra=False):
+        number = len(pathlist)
+        for p in pathlist:
+            osl[p].size = 1
+
+        i = 0
+        for path in pathlist:
+            osl[path].in_progress(None)
+
+            ddir = os.path.join(destdir, os.path.basename(path))
+            for root, dirs, files in os.walk(path):
+                droot = os.path.join(ddir, os.path.relpath(root, path))
+                if not os.path.isdir(droot):
+                    os.makedirs(droot)
+
+                if delete_extra:
+                    for e in set(os.listdir(droot)) - set(dirs + files):
+                        e = os.path.join(droot, e)
+                        if os.path.isdir(e):
+                            shutil.rmtree(e)
+                        else:
+                            os.unlink(e)
+
+                for f in files:
+                    src = os.path.join(root, f)
+                    dst = os.path.join(droot, f)
+                    if (os.path.exists(dst) and
+                            os.path.getsize(dst) == os.path.getsize(src) and
+                            os.path.getmtime(dst) >= os.path.getmtime(src)):
+                        continue
+                    shutil.copy2(src, dst)
+
+            osl[path].done()
+
+            i += 1
+            yield i, number
+
     def upload_files(self, files, path, osl):
         number = len(files)
         for f in files:
@@ -317,6 +487,47 @@ class OSCatalog(Catalog):
             i += 1
             yield i, number
 
+    def upload_archive(self, archive_files, path, osl):
+        number = len(archive_files)
+        for a in archive_files:
+            osl[a].size = 1
+
+        skipped = []
+        members = 0
+        i = 0
+        for a in archive_files:
+            osl[a].in_progress(None)
+
+            with open(a, 'rb') as f:
+                for name, isdir, _, stream in archives.archive_members(
+                        f, skipped):
+                    members += 1
+                    target = os.path.join(path, name)
+                    if isdir:
+                        if not os.path.isdir(target):
+                            os.makedirs(target)
+                        continue
+
+                    if not os.path.isdir(os.path.dirname(target)):
+                        os.makedirs(os.path.dirname(target))
+
+                    with open(target, 'wb') as dst:
+                        shutil.copyfileobj(stream, dst)
+
+            osl[a].done()
+            i += 1
+            yield i, number
+
+        if skipped:
+            raise exceptions.CatalogLogicError(
+                exceptions.OperationFailures('archive member uploads',
+                                             skipped,
+                                             members + len(skipped)))
+
+    def sync_upload_directories(self, dirs, path, osl):
+        # uploading is the same as synchronizing local directories to path
+        return self.sync_directories(dirs, path, osl)
+
     def delete_files(self, files, osl):
         number = len(files)
         for f in files:
@@ -347,6 +558,34 @@ class OSCatalog(Catalog):
             i += 1
             yield i, number
 
+    def _apply(self, elements, osl, func):
+        number = len(elements)
+        for e in elements:
+            osl[e].size = 1
+
+        i = 0
+        for e in elements:
+            osl[e].in_progress(None)
+            func(e)
+            osl[e].done()
+            i += 1
+            yield i, number
+
+    def move_files(self, files, path, osl):
+        return self._apply(files, osl, lambda f: shutil.move(f, path))
+
+    def move_directories(self, directories, path, osl):
+        return self._apply(directories, osl, lambda d: shutil.move(d, path))
+
+    def copy_files(self, files, path, osl):
+        return self._apply(files, osl, lambda f: shutil.copy2(f, path))
+
+    def copy_directories(self, directories, path, osl):
+        def _copy(d):
+            shutil.copytree(d, os.path.join(path, os.path.basename(d)))
+
+        return self._apply(directories, osl, _copy)
+
     def mkdir(self, path):
         os.mkdir(path)
 
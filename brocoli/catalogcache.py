@@ -0,0 +1,291 @@
+"""
+Metadata cache around Catalog objects
+"""
+
+import errno
+import functools
+import itertools
+import threading
+import time
+
+from collections import OrderedDict
+
+from six import print_
+
+
+class CachedCatalog(object):
+    """
+    Wraps a Catalog object, caching the results of isdir(), lstat() and
+    listdir() for ttl seconds. At most max_entries results are kept, least
+    recently used ones being evicted first. Missing paths are cached too
+    (negative caching).
+
+    A fresh listing of a directory also answers isdir() and lstat() for its
+    entries. Operations modifying the catalog invalidate the entries of the
+    paths they touch once they are finished. Other attributes are those of
+    the wrapped catalog (see catalog.Catalog).
+    """
+    # listings streamed by listdir_pages() are only cached up to this size
+    MAX_LISTING_ENTRIES = 10000
+
+    def __init__(self, wrapped, ttl=30, max_entries=10000):
+        self.wrapped = wrapped
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # (method name, path) -> (expiration time, result, exception)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # incremented by invalidations, so that results retrieved before
+        # them are not stored
+        self.generation = 0
+
+    def __getattr__(self, name):
+        # only called for attributes not found on the cache object
+        return getattr(self.wrapped, name)
+
+    def _lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            if entry[0] < time.time():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, result, exception=None, generation=None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+
+            self.entries[key] = time.time() + self.ttl, result, exception
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _cached(self, method, path):
+        key = method, path
+        entry = self._lookup(key)
+
+        if entry is None:
+            try:
+                result = getattr(self.wrapped, method)(path)
+            except IOError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+                self._store(key, None, e)
+                raise
+
+            self._store(key, result)
+            return result
+
+        _, result, exception = entry
+        if exception is not None:
+            raise exception
+
+        return result
+
+    def _parent_entry(self, path):
+        # returns (True, listing entry of path or None if absent) from a fresh
+        # listing of its parent, (False, None) if there is none
+        parent = self.wrapped.dirname(path)
+        if parent == path:
+            return False, None
+
+        entry = self._lookup(('listdir', parent))
+        if entry is None or entry[2] is not None:
+            return False, None
+
+        return True, entry[1].get(self.wrapped.basename(path))
+
+    def isdir(self, path):
+        listed, st = self._parent_entry(path)
+        if listed:
+            return st is not None and st['isdir']
+
+        return self._cached('isdir', path)
+
+    def lstat(self, path):
+        listed, st = self._parent_entry(path)
+        if listed:
+            if st is None:
+                raise IOError(errno.ENOENT, 'No such file or directory', path)
+            return st
+
+        return self._cached('lstat', path)
+
+    def listdir(self, path):
+        return self._cached('listdir', path)
+
+    def listdir_pages(self, path, page_size=1000):
+        entry = self._lookup(('listdir', path))
+        if entry is not None and entry[2] is None:
+            items = iter(entry[1].items())
+            page = dict(itertools.islice(items, page_size))
+            while page:
+                yield page
+                page = dict(itertools.islice(items, page_size))
+            return
+
+        # invalidations while pages are streamed make the listing stale
+        generation = self.generation
+
+        listing = {}
+        for page in self.wrapped.listdir_pages(path, page_size):
+            if listing is not None:
+                listing.update(page)
+                if len(listing) > self.MAX_LISTING_ENTRIES:
+                    listing = None
+
+            yield page
+
+        if listing is not None:
+            self._store(('listdir', path), listing, generation=generation)
+
+    def invalidate(self, path, recursive=False):
+        """
+        Forgets cached results about path (and its sub-paths if recursive is
+        True), as well as its parent listing
+        """
+        parent = self.wrapped.dirname(path)
+        prefix = self.wrapped.join(path, '')
+
+        with self.lock:
+            self.generation += 1
+
+            for key in list(self.entries):
+                p = key[1]
+                if (p == path or (key[0] == 'listdir' and p == parent) or
+                        (recursive and p.startswith(prefix))):
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def prefetch(self, path, cancelled=None):
+        """
+        Caches the listing of path, unless a fresh one is already cached.
+        Listings larger than MAX_LISTING_ENTRIES are abandoned, as well as
+        cancelled ones.
+        """
+        key = 'listdir', path
+        if self._lookup(key) is not None:
+            return
+
+        generation = self.generation
+
+        listing = {}
+        for page in self.wrapped.listdir_pages(path):
+            if cancelled is not None and cancelled():
+                return
+
+            listing.update(page)
+            if len(listing) > self.MAX_LISTING_ENTRIES:
+                return
+
+        self._store(key, listing, generation=generation)
+
+    def _invalidate_after(self, operation, paths, recursive):
+        # wraps generator operation, invalidating paths when it ends
+        try:
+            for y in operation:
+                yield y
+        finally:
+            print_('invalidate cache for', len(paths), 'paths')
+            for p in paths:
+                self.invalidate(p, recursive)
+
+    def _targets(self, sources, path):
+        # catalog paths of sources copied, moved or uploaded into path
+        return [self.wrapped.join(path, self.wrapped.basename(s))
+                for s in sources]
+
+    def mkdir(self, path):
+        try:
+            return self.wrapped.mkdir(path)
+        finally:
+            self.invalidate(path)
+
+    def delete_files(self, files, osl):
+        return self._invalidate_after(self.wrapped.delete_files(files, osl),
+                                      files, False)
+
+    def delete_directories(self, directories, osl):
+        return self._invalidate_after(
+            self.wrapped.delete_directories(directories, osl),
+            directories, True)
+
+    def upload_files(self, files, path, osl):
+        return self._invalidate_after(
+            self.wrapped.upload_files(files, path, osl),
+            self._targets(files, path), False)
+
+    def upload_directories(self, dirs, path, osl):
+        return self._invalidate_after(
+            self.wrapped.upload_directories(dirs, path, osl),
+            self._targets(dirs, path), True)
+
+    def sync_upload_directories(self, dirs, path, osl):
+        return self._invalidate_after(
+            self.wrapped.sync_upload_directories(dirs, path, osl),
+            self._targets(dirs, path), True)
+
+    def upload_archive(self, archive_files, path, osl):
+        # archive members may land anywhere under path
+        return self._invalidate_after(
+            self.wrapped.upload_archive(archive_files, path, osl),
+            [path], True)
+
+    def _copy_or_move(self, method, sources, path, osl, move):
+        operation = getattr(self.wrapped, method)(sources, path, osl)
+        paths = self._targets(sources, path)
+        if move:
+            paths += sources
+
+        return self._invalidate_after(operation, paths, True)
+
+    def copy_files(self, files, path, osl):
+        return self._copy_or_move('copy_files', files, path, osl, False)
+
+    def copy_directories(self, directories, path, osl):
+        return self._copy_or_move('copy_directories', directories, path, osl,
+                                  False)
+
+    def move_files(self, files, path, osl):
+        return self._copy_or_move('move_files', files, path, osl, True)
+
+    def move_directories(self, directories, path, osl):
+        return self._copy_or_move('move_directories', directories, path, osl,
+                                  True)
+
+    def close(self):
+        self.clear()
+        self.wrapped.close()
+
+
+def cached_catalog_factory(catalog_factory, ttl, max_entries=10000):
+    """
+    Wraps a catalog factory (see config.Config.connection()) so that it
+    returns CachedCatalog objects, unless ttl is 0
+    """
+    if not ttl:
+        return catalog_factory
+
+    @functools.wraps(catalog_factory)
+    def factory(master):
+        cat = catalog_factory(master)
+        if cat is None:
+            return None
+
+        return CachedCatalog(cat, ttl, max_entries)
+
+    return factory
@@ -0,0 +1,114 @@
+"""
+Persistent cache of local file checksums
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+# default cache location
+default_cache_filename = os.path.join(os.path.expanduser('~'),
+                                      '.brocoli_cksum.sqlite')
+
+
+def stat_key(filename):
+    """
+    Returns the (device, inode, size, mtime_ns) identity of a local file
+    """
+    st = os.stat(filename)
+    mtime_ns = getattr(st, 'st_mtime_ns', int(st.st_mtime * 1e9))
+
+    # device and inode numbers may overflow SQLite integers: store as text
+    return str(st.st_dev), str(st.st_ino), st.st_size, mtime_ns
+
+
+class ChecksumCache(object):
+    """
+    Remembers checksums of local files in a SQLite database, keyed by (device,
+    inode, size, mtime_ns, algorithm) so that any modification of a file
+    invalidates its entries. Least recently used entries are evicted when the
+    cache grows over max_entries.
+    """
+    EVICTION_PERIOD = 100
+
+    def __init__(self, filename=None, max_entries=100000):
+        self.filename = filename or default_cache_filename
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.inserts = 0
+
+        # connection is shared by transfer threads (serialized by self.lock)
+        self.db = sqlite3.connect(self.filename, check_same_thread=False)
+        # cache contents can be recomputed: favor speed over durability
+        self.db.execute('PRAGMA synchronous = OFF')
+        self.db.execute('CREATE TABLE IF NOT EXISTS checksums ('
+                        'device TEXT, inode TEXT, size INTEGER, '
+                        'mtime_ns INTEGER, algorithm TEXT, checksum TEXT, '
+                        'accessed REAL, '
+                        'PRIMARY KEY (device, inode, size, mtime_ns, '
+                        'algorithm))')
+        self.db.execute('CREATE INDEX IF NOT EXISTS checksums_accessed '
+                        'ON checksums (accessed)')
+        self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def get(self, filename, algorithm):
+        """
+        Returns the cached checksum of filename or None
+        """
+        try:
+            key = stat_key(filename) + (algorithm, )
+        except OSError:
+            return None
+
+        where = ('device = ? AND inode = ? AND size = ? AND mtime_ns = ? AND '
+                 'algorithm = ?')
+
+        with self.lock:
+            r = self.db.execute(
+                'SELECT checksum FROM checksums WHERE ' + where,
+                key).fetchone()
+            if r is None:
+                return None
+
+            self.db.execute('UPDATE checksums SET accessed = ? WHERE ' + where,
+                            (time.time(), ) + key)
+            self.db.commit()
+
+        return r[0]
+
+    def set(self, filename, algorithm, checksum, key=None):
+        """
+        Stores the checksum of filename. key is the stat_key() taken before
+        computing the checksum: nothing is stored if the file changed in the
+        meantime.
+        """
+        try:
+            current = stat_key(filename)
+        except OSError:
+            return
+
+        if key is not None and key != current:
+            return
+
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO checksums VALUES '
+                            '(?, ?, ?, ?, ?, ?, ?)',
+                            current + (algorithm, checksum, time.time()))
+
+            self.inserts += 1
+            if self.inserts % self.EVICTION_PERIOD == 0:
+                self._evict()
+
+            self.db.commit()
+
+    def _evict(self):
+        # keep max_entries most recently accessed entries
+        self.db.execute('DELETE FROM checksums WHERE rowid IN ('
+                        'SELECT rowid FROM checksums ORDER BY accessed DESC '
+                        'LIMIT -1 OFFSET ?)', (self.max_entries, ))
@@ -1,5 +1,7 @@
 from . import catalog
+from . import catalogcache
 from . import irodscatalog
+from . config_option import int_option
 
 from six.moves import configparser
 from six import print_
@@ -49,6 +51,10 @@ class Config(collections.OrderedDict):
         elif catalog_type == 'irods4':
             cat = irodscatalog.irods4_catalog_from_config(conn)
 
+        if cat is not None:
+            ttl = int_option(conn, 'metadata_cache_ttl', 30)
+            cat = catalogcache.cached_catalog_factory(cat, ttl)
+
         return cat, conn['root_path']
 
     def connection_names(self):
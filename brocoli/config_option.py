@@ -1,3 +1,6 @@
+from six import print_
+
+
 def option_is_true(option):
     option = option.lower()
     if option in ['1', 'yes', 'on', 'true']:
@@ -12,3 +15,25 @@ def option_is_true(option):
 def option_is_false(option):
     return not option_is_true(option)
 
+
+def int_option(cfg, name, default, minimum=0):
+    """
+    Reads integer option name from configuration, falling back to default
+    (with a warning) when it is not a number or below minimum. An empty
+    value stands for minimum.
+    """
+    value = cfg.get(name, str(default))
+    if value == '' or value is None:
+        return minimum
+
+    try:
+        ret = int(value)
+    except ValueError:
+        ret = None
+
+    if ret is None or ret < minimum:
+        print_('invalid value {!r} for {}, using {}'.format(value, name,
+                                                            default))
+        return default
+
+    return ret
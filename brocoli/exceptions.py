@@ -32,10 +32,60 @@ class CatalogLogicError(BrocoliError):
 class ChecksumError(Exception):
     pass
 
+
+class OperationFailures(Exception):
+    """
+    Sums up the failures of an operation on several elements, failures being
+    a list of (element, exception) pairs
+    """
+    MAX_LISTED = 10
+
+    def __init__(self, operation, failures, number):
+        self.operation = operation
+        self.failures = failures
+        self.number = number
+
+    def __str__(self):
+        lines = ['{} of {} {} failed'.format(len(self.failures), self.number,
+                                             self.operation)]
+        lines += ['{}: {}'.format(e, x)
+                  for e, x in self.failures[:self.MAX_LISTED]]
+        if len(self.failures) > self.MAX_LISTED:
+            lines.append('...')
+
+        return '\n'.join(lines)
+
+
 def ioerror(no):
     return IOError(no, os.strerror(no))
 
 
+def report_catalog_exception(e):
+    """
+    Presents a Brocoli exception to the user with a message
+    """
+    if isinstance(e, ConnectionError):
+        messagebox.showerror('Catalog Connection Error',
+                             ('Connection failed: ' +
+                              '{}').format(str(e)))
+    elif isinstance(e, FileNotFoundError):
+        messagebox.showerror('File Not Found',
+                             ('Catalog file was not found: ' +
+                              '{}').format(str(e)))
+    elif isinstance(e, CatalogLogicError):
+        messagebox.showerror('Catalog Logic Error',
+                             ('Catalog logic error occurred: ' +
+                              '{}').format(str(e)))
+    elif isinstance(e, ChecksumError):
+        messagebox.showerror('Checksum Error',
+                             ('Checksum error occurred: ' +
+                              '{}').format(str(e)))
+    else:
+        messagebox.showerror('Unknown Error',
+                             ('Some unknown exception occurred: ' +
+                              '{}').format(str(e)))
+
+
 def handle_catalog_exceptions(method):
     """
     Method decorator that presents Brocoli exceptions to the user with messages
@@ -43,26 +93,11 @@ def handle_catalog_exceptions(method):
     def method_wrapper(self, *args, **kwargs):
         try:
             return method(self, *args, **kwargs)
-        except ConnectionError as e:
-            messagebox.showerror('Catalog Connection Error',
-                                 ('Connection failed: ' +
-                                  '{}').format(str(e)))
-        except FileNotFoundError as e:
-            messagebox.showerror('File Not Found',
-                                 ('Catalog file was not found: ' +
-                                  '{}').format(str(e)))
-        except CatalogLogicError as e:
-            messagebox.showerror('Catalog Logic Error',
-                                 ('Catalog logic error occurred: ' +
-                                  '{}').format(str(e)))
-        except ChecksumError as e:
-            messagebox.showerror('Checksum Error',
-                                 ('Checksum error occurred: ' +
-                                  '{}').format(str(e)))
         except Exception as e:
-            messagebox.showerror('Unknown Error',
-                                 ('Some unknown exception occurred: ' +
-                                  '{}').format(str(e)))
-            print_(traceback.format_exc())
+            report_catalog_exception(e)
+
+            if not isinstance(e, (ConnectionError, FileNotFoundError,
+                                  CatalogLogicError, ChecksumError)):
+                print_(traceback.format_exc())
 
     return method_wrapper
@@ -5,21 +5,37 @@ Implements iRODS Catalog object and methods
 from . import catalog
 from . import form
 from . import exceptions
+from . import archives
 from . listmanager import ColumnDef, List
-from . config_option import option_is_true
+from . config_option import option_is_true, int_option
 
-from . irodsdom import ModifiedDataObjectManager
+from . irodsdom import ModifiedDataObjectManager, CollOprStat
+from . workerpool import WorkerPool
+from . cksumcache import ChecksumCache, stat_key
+from . transfertuner import TransferTuner, ResourceRanking
+from . buffers import read_views
 
 import re
 import os
 import io
 import hashlib
+import itertools
 import base64
 import collections
 import datetime
 import ssl
+import json
+import shutil
+import calendar
+import contextlib
+import tarfile
+import tempfile
+import threading
+import time
+import uuid
 from datetime import timezone
 
+import six
 from six import print_
 from six.moves import tkinter as tk
 
@@ -30,7 +46,6 @@ from irods.manager.data_object_manager import DataObjectManager
 from irods.manager.collection_manager import CollectionManager
 from irods.models import DataObject, Collection
 from irods.manager import data_object_manager
-from irods.data_object import chunks
 from irods.column import Like
 from irods.api_number import api_number
 import irods.keywords as kw
@@ -51,6 +66,9 @@ else:
 
     _getuid = _fake_getuid
 
+# interrupted resumable uploads state location
+upload_state_dir = os.path.join(os.path.expanduser('~'), '.brocoli-uploads')
+
 
 def parse_env3(path):
     """
@@ -72,6 +90,13 @@ def parse_env3(path):
     return ret
 
 
+def catalog_timestamp(dt):
+    """
+    Converts a catalog (UTC) datetime to a POSIX timestamp
+    """
+    return calendar.timegm(dt.utctimetuple())
+
+
 def local_trees_stats(dirs):
     """
     Gathers stats (number of files and cumulated size) of sub-trees on a local
@@ -105,22 +130,53 @@ def local_files_stats(files):
     return len(files), sum(v for v in stats.values()), stats
 
 
+def transfer_options_from_config(cfg):
+    """
+    Extracts catalog transfer tuning keyword arguments from configuration
+    """
+    return {
+        'transfer_threads': int_option(cfg, 'transfer_threads', 4, 1),
+        'parallel_threshold': int_option(cfg, 'parallel_threshold', 512),
+        'parallel_streams': int_option(cfg, 'parallel_streams', 4, 1),
+        'cksum_cache_size': int_option(cfg, 'cksum_cache_size', 100000),
+        'resume_downloads': option_is_true(cfg.get('resume_downloads',
+                                                   'True')),
+        'resume_uploads': option_is_true(cfg.get('resume_uploads', 'True')),
+        'bundle_threshold': int_option(cfg, 'bundle_threshold', 0),
+        'adaptive_transfers': option_is_true(cfg.get('adaptive_transfers',
+                                                     'True')),
+        'preferred_resources': [r.strip() for r in
+                                cfg.get('preferred_resources', '').split(',')
+                                if r.strip()],
+    }
+
+
+@contextlib.contextmanager
+def translated_exceptions(catalog):
+    """
+    Context manager that translates iRODS to Brocoli exceptions raised by
+    catalog operations, closing catalog on authentication errors
+    """
+    try:
+        yield
+    except irods.exception.CAT_INVALID_AUTHENTICATION as e:
+        catalog.close()
+        raise exceptions.ConnectionError(e)
+    except (irods.exception.NetworkException, ssl.SSLError) as e:
+        raise exceptions.NetworkError(e)
+    except irods.exception.CAT_UNKNOWN_COLLECTION as e:
+        raise exceptions.FileNotFoundError(e)
+    except irods.exception.CAT_SQL_ERR as e:
+        raise exceptions.CatalogLogicError(e)
+
+
 def method_translate_exceptions(method):
     """
     Method decorator that translates iRODS to Brocoli exceptions
     """
     def method_wrapper(self, *args, **kwargs):
-        try:
+        with translated_exceptions(self):
             return method(self, *args, **kwargs)
-        except irods.exception.CAT_INVALID_AUTHENTICATION as e:
-            self.close()
-            raise exceptions.ConnectionError(e)
-        except (irods.exception.NetworkException, ssl.SSLError) as e:
-            raise exceptions.NetworkError(e)
-        except irods.exception.CAT_UNKNOWN_COLLECTION as e:
-            raise exceptions.FileNotFoundError(e)
-        except irods.exception.CAT_SQL_ERR as e:
-            raise exceptions.CatalogLogicError(e)
 
     return method_wrapper
 
@@ -151,29 +207,77 @@ class iRODSCatalogBase(catalog.Catalog):
 
     BUFFER_SIZE = io.DEFAULT_BUFFER_SIZE * 1000
 
-    def local_file_cksum(self, filename, algorithm=None):
-        def get_digest(h):
-            if h.name == 'sha256':
-                return 'sha2:' + base64.b64encode(h.digest()).decode()
+    # resumable downloads are written to file + PARTIAL_SUFFIX, their state
+    # being recorded in file + RESUME_SUFFIX
+    PARTIAL_SUFFIX = '.part'
+    RESUME_SUFFIX = '.brocoli-resume'
 
-            return h.hexdigest()
+    # yielded by transfer tasks right before they start writing their target,
+    # which is only cancelled on interruption from then on
+    WRITING = object()
+
+    # small files bundles are uploaded as BUNDLE_PREFIX + unique id + '.tar'
+    # objects in their destination collection, and hold up to
+    # BUNDLE_MAX_FILES files or BUNDLE_MAX_SIZE bytes
+    BUNDLE_PREFIX = '.brocoli-bundle-'
+    BUNDLE_MAX_FILES = 1000
+    BUNDLE_MAX_SIZE = 64 * 1024 * 1024
+
+    @staticmethod
+    def cksum_digest(h):
+        """
+        Formats a hashlib object digest the way iRODS does
+        """
+        if h.name == 'sha256':
+            return 'sha2:' + base64.b64encode(h.digest()).decode()
 
+        return h.hexdigest()
+
+    @staticmethod
+    def cksum_algorithm_ref(ref_cksum):
+        """
+        Returns the hashlib algorithm name matching a catalog checksum
+        """
+        if ref_cksum.startswith('sha2:'):
+            return 'sha256'
+
+        return 'md5'
+
+    def local_file_cksum(self, filename, algorithm=None):
         if algorithm is None:
             algorithm = getattr(self.session.pool.account,
                                 'default_hash_scheme', 'SHA256').lower()
 
+        if self.cksum_cache is not None:
+            cksum = self.cksum_cache.get(filename, algorithm)
+            if cksum is not None:
+                # account for the data as if it was read
+                yield os.path.getsize(filename), ''
+                yield 0, cksum
+                return
+
+        key = stat_key(filename)
+
         scheme = hashlib.new(algorithm)
         with open(filename, 'rb') as f:
-            for chunk in chunks(f, self.BUFFER_SIZE):
+            for chunk in read_views(f, self.BUFFER_SIZE):
                 scheme.update(chunk)
                 yield len(chunk), ''
 
-        yield 0, get_digest(scheme)
+        cksum = self.cksum_digest(scheme)
+        self.remember_cksum(filename, algorithm, cksum, key)
+
+        yield 0, cksum
+
+    def remember_cksum(self, filename, algorithm, cksum, key=None):
+        """
+        Stores a local file checksum into the checksum cache (if enabled)
+        """
+        if self.cksum_cache is not None:
+            self.cksum_cache.set(filename, algorithm, cksum, key)
 
     def local_file_cksum_ref(self, filename, ref_cksum):
-        algorithm = None
-        if ref_cksum.startswith('sha2:'):
-            algorithm = 'sha256'
+        algorithm = self.cksum_algorithm_ref(ref_cksum)
 
         for y in self.local_file_cksum(filename, algorithm):
             yield y
@@ -186,13 +290,51 @@ class iRODSCatalogBase(catalog.Catalog):
     def decode(cls, s):
         return password_obfuscation.decode(s, _getuid())
 
-    def __init__(self, session, default_resc, local_checksum):
+    def __init__(self, session, default_resc, local_checksum,
+                 transfer_threads=1, parallel_threshold=0, parallel_streams=1,
+                 cksum_cache_size=0, resume_downloads=False,
+                 resume_uploads=False, bundle_threshold=0,
+                 adaptive_transfers=False, preferred_resources=None):
         self.session = session
 
         self.default_resc = default_resc
 
         self.local_checksum = local_checksum
 
+        # number of concurrent transfers (one pooled connection each)
+        self.transfer_threads = max(1, transfer_threads)
+
+        # objects larger than parallel_threshold MB are transferred as
+        # parallel_streams byte ranges (0 disables)
+        self.parallel_threshold = parallel_threshold * 1024 * 1024
+        self.parallel_streams = max(1, parallel_streams)
+
+        # persistent local checksums cache (0 entries disables)
+        self.cksum_cache = None
+        if cksum_cache_size > 0:
+            self.cksum_cache = ChecksumCache(max_entries=cksum_cache_size)
+
+        # keep interrupted downloads to resume them later
+        self.resume_downloads = resume_downloads
+        # keep interrupted uploads partial objects to resume them later
+        self.resume_uploads = resume_uploads
+
+        # files smaller than bundle_threshold KB are uploaded as tar bundles
+        # extracted by the server (0 disables)
+        self.bundle_threshold = bundle_threshold * 1024
+        # set once the server refused to extract a bundle
+        self.bundles_refused = False
+
+        # chunk size and concurrent transfers, adapted to the connection
+        # throughput when adaptive_transfers is set
+        self.tuner = TransferTuner(self.connection_key(), self.BUFFER_SIZE,
+                                   self.transfer_threads,
+                                   enabled=adaptive_transfers)
+
+        # downloads read from the best ranked resource holding a good replica
+        self.resource_ranking = ResourceRanking(self.connection_key(),
+                                                preferred_resources or [])
+
         self.dom = ModifiedDataObjectManager(self.session)
         self.cm = self.session.collections
         try:
@@ -201,12 +343,302 @@ class iRODSCatalogBase(catalog.Catalog):
             # prc < 2.0.0
             self.am = self.session.permissions
 
+    def connection_key(self):
+        """
+        Returns a string identifying the iRODS connection
+        """
+        account = self.session.pool.account
+        return '{}@{}:{}/{}'.format(getattr(account, 'client_user', ''),
+                                    getattr(account, 'host', ''),
+                                    getattr(account, 'port', ''),
+                                    getattr(account, 'client_zone', ''))
+
     def close(self):
+        self.tuner.save()
+        self.resource_ranking.save()
+
         self.session.cleanup()
 
+        if self.cksum_cache is not None:
+            self.cksum_cache.close()
+
     def cksum_factor(self):
         return 2 if self.local_checksum else 1
 
+    def is_parallel(self, size):
+        """
+        Returns wether an object of size bytes should be transferred as
+        parallel byte ranges
+        """
+        return (self.parallel_threshold > 0 and self.parallel_streams > 1 and
+                size is not None and size > self.parallel_threshold)
+
+    def byte_ranges(self, size):
+        """
+        Splits size bytes in parallel_streams contiguous (offset, length)
+        ranges
+        """
+        step = -(-size // self.parallel_streams)
+        step = max(step, self.BUFFER_SIZE)
+
+        return [(o, min(step, size - o)) for o in range(0, size, step)]
+
+    def source_replica(self, info):
+        """
+        Returns the good replica to download an object from, according to
+        resource ranking, or None when object info is unknown
+        """
+        if info is None:
+            return None
+
+        good = [r for r in info['replicas'] if r['status'] == '1']
+        if not good:
+            return None
+
+        return self.resource_ranking.best(good)
+
+    def _record_replica_read(self, replica, nbytes, seconds):
+        if replica is not None:
+            self.resource_ranking.record(replica['resource_name'], nbytes,
+                                         seconds)
+
+    def is_bundled(self, size):
+        """
+        Returns wether a file of size bytes should be uploaded in a small
+        files bundle
+        """
+        return (self.bundle_threshold > 0 and not self.bundles_refused and
+                size < self.bundle_threshold)
+
+    def _make_bundle(self, files):
+        """
+        Packs local files into a temporary tar file and returns its name
+        """
+        fd, bundle_file = tempfile.mkstemp(suffix='.tar')
+        try:
+            with os.fdopen(fd, 'wb') as f, \
+                    tarfile.open(fileobj=f, mode='w') as tar:
+                for file in files:
+                    # store symbolic links targets like plain uploads do
+                    with open(file, 'rb') as member:
+                        info = tar.gettarinfo(arcname=os.path.basename(file),
+                                              fileobj=member)
+                        tar.addfile(info, member)
+        except Exception:
+            os.unlink(bundle_file)
+            raise
+
+        return bundle_file
+
+    def _parallel_open_options(self, o):
+        """
+        Returns open() keyword arguments allowing extra handles to write into
+        the replica opened by o, or None when it cannot be shared (old client
+        library or server)
+        """
+        raw = getattr(o, 'raw', o)
+        if not hasattr(raw, 'replica_access_info'):
+            return None
+
+        try:
+            token, hier = raw.replica_access_info()
+        except irods.exception.iRODSException:
+            return None
+
+        return {
+            kw.REPLICA_TOKEN_KW: token,
+            kw.RESC_HIER_STR_KW: hier,
+            'finalize_on_close': False,
+        }
+
+    def _read_resume_state(self, file):
+        try:
+            with open(file + self.RESUME_SUFFIX, 'r') as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write_resume_state(self, file, state):
+        with open(file + self.RESUME_SUFFIX, 'w') as f:
+            json.dump(state, f)
+
+    def _discard_partial_download(self, file):
+        for suffix in (self.PARTIAL_SUFFIX, self.RESUME_SUFFIX):
+            try:
+                os.unlink(file + suffix)
+            except OSError:
+                pass
+
+    def _resume_ranges(self, file, expected, ranges):
+        """
+        Returns the [offset, length, done] byte ranges of an interrupted
+        download to file, done bytes being already written from offset. When
+        there is nothing valid to resume, (offset, length) ranges give the
+        split of a new download, with nothing done. expected is the resume
+        state (without ranges) of the current download.
+        """
+        fresh = [[o, l, 0] for o, l in ranges]
+
+        state = self._read_resume_state(file)
+
+        if state is None or 'ranges' not in state or \
+                any(state.get(k) != v for k, v in expected.items()):
+            # no previous download, or remote object changed since
+            self._discard_partial_download(file)
+            return fresh
+
+        try:
+            partial_size = os.path.getsize(file + self.PARTIAL_SUFFIX)
+        except OSError:
+            return fresh
+
+        # only trust data present in the partial file
+        return [[o, l, max(0, min(d, l, partial_size - o))]
+                for o, l, d in state['ranges']]
+
+    @staticmethod
+    def contiguous_done(ranges):
+        """
+        Returns the size of the data done from offset 0 in [offset, length,
+        done] byte ranges
+        """
+        offset = 0
+        for o, l, d in sorted(ranges):
+            if o != offset:
+                break
+
+            offset += d
+            if d < l:
+                break
+
+        return offset
+
+    def _download_cancel(self, f):
+        if os.path.exists(f + self.RESUME_SUFFIX):
+            print_('interrupted: keep partial download', f)
+            return
+
+        if not os.path.exists(f):
+            # interrupted before transfer started
+            return
+
+        print_('interrupted: delete', f)
+        os.unlink(f)
+
+    def _tree_members(self, path):
+        """
+        Streams (collection path, object name, size, modification time)
+        tuples for a collection tree, collections first (with a None object
+        name), then data objects ordered by collection. Query results are
+        not accumulated, whatever the tree size.
+        """
+        q = self.session.query(Collection.name, Collection.modify_time)
+        q = q.order_by(Collection.name)
+        for qf in [q.filter(Collection.name == path),
+                   q.filter(Like(Collection.name, self.join(path, '%')))]:
+            for r in qf.get_results():
+                yield r[Collection.name], None, 0, r[Collection.modify_time]
+
+        q = self.session.query(Collection.name, DataObject.name,
+                               DataObject.size, DataObject.modify_time)
+        q = q.order_by(Collection.name).order_by(DataObject.name)
+
+        # replicas come as consecutive rows
+        last = None
+        for qf in [q.filter(Collection.name == path),
+                   q.filter(Like(Collection.name, self.join(path, '%')))]:
+            for r in qf.get_results():
+                key = r[Collection.name], r[DataObject.name]
+                if key == last:
+                    continue
+                last = key
+
+                yield key + (int(r[DataObject.size]),
+                             r[DataObject.modify_time])
+
+    def _upload_state_file(self, obj):
+        name = hashlib.md5(obj.encode('utf-8')).hexdigest() + '.json'
+        return os.path.join(upload_state_dir, name)
+
+    def _upload_state(self, file, obj):
+        return {
+            'file': os.path.abspath(file),
+            'key': list(stat_key(file)),
+            'object': obj,
+        }
+
+    def _write_upload_state(self, file, obj, ranges):
+        try:
+            os.makedirs(upload_state_dir)
+        except OSError:
+            if not os.path.isdir(upload_state_dir):
+                raise
+
+        state = self._upload_state(file, obj)
+        state['ranges'] = ranges
+        with open(self._upload_state_file(obj), 'w') as f:
+            json.dump(state, f)
+
+    def _discard_upload_state(self, obj):
+        try:
+            os.unlink(self._upload_state_file(obj))
+        except OSError:
+            pass
+
+    def _upload_resume_ranges(self, file, obj, ranges):
+        """
+        Returns the [offset, length, done] byte ranges of an interrupted
+        upload of file to obj, done bytes being already written from offset
+        (see _resume_ranges()). Recorded ranges are only trusted up to the
+        remote size of the partial replica.
+        """
+        fresh = [[o, l, 0] for o, l in ranges]
+
+        try:
+            with open(self._upload_state_file(obj), 'r') as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            return fresh
+
+        recorded = state.pop('ranges', None)
+        if recorded is None or state != self._upload_state(file, obj):
+            # local file changed since
+            return fresh
+
+        try:
+            with self.dom.open(obj, 'r') as o:
+                remote_size = o.seek(0, os.SEEK_END)
+        except irods.exception.iRODSException:
+            return fresh
+
+        return [[o, l, max(0, min(d, l, remote_size - o))]
+                for o, l, d in recorded]
+
+    def _upload_cancel(self, f):
+        if os.path.exists(self._upload_state_file(f)):
+            print_('interrupted: keep partial upload', f)
+            return
+
+        print_('interrupted: delete', f)
+        try:
+            self.dom.unlink(f, force=True)
+        except irods.exception.iRODSException as e:
+            # interrupted before the object was created
+            print_('cannot delete', f, e)
+
+    def _parallel_ranges(self, tasks):
+        """
+        Runs byte range transfer tasks concurrently and yields the transferred
+        sizes
+        """
+        with WorkerPool(self.parallel_streams, tasks) as pool:
+            for event, key, value in pool:
+                if event == WorkerPool.ERROR:
+                    six.reraise(*value)
+
+                if event == WorkerPool.YIELD:
+                    yield value
+
     def splitname(self, path):
         return path.rsplit('/', 1)
 
@@ -238,9 +670,11 @@ class iRODSCatalogBase(catalog.Catalog):
 
     @method_translate_exceptions
     def lstat(self, path):
-        if self.isdir(path):
+        # collection query doubles as isdir()
+        try:
             return self.lstat_dir(path)
-        return self.lstat_file(path)
+        except irods.exception.NoResultFound:
+            return self.lstat_file(path)
 
     def lstat_dir(self, path):
         q = self.session.query(Collection.owner_name)
@@ -258,14 +692,17 @@ class iRODSCatalogBase(catalog.Catalog):
 
         return ret
 
-    def lstat_dirs(self, parent_path):
+    def dirs_entries(self, parent_path):
+        """
+        Generates (name, lstat dictionary) pairs for the sub-collections of
+        parent_path, ordered by name, as query result pages arrive
+        """
         q = self.session.query(Collection.name, Collection.owner_name)
         q = q.filter(Collection.parent_name == parent_path)
+        q = q.order_by(Collection.name)
 
-        ret = {}
         for r in q.get_results():
-
-            ret[self.basename(r[Collection.name])] = {
+            yield self.basename(r[Collection.name]), {
                 'user': r[Collection.owner_name],
                 'size': '',
                 'mtime': '',
@@ -273,9 +710,14 @@ class iRODSCatalogBase(catalog.Catalog):
                 'isdir': True,
             }
 
-        return ret
+    def lstat_dirs(self, parent_path):
+        return dict(self.dirs_entries(parent_path))
 
-    def lstat_files(self, dirname):
+    def files_entries(self, dirname):
+        """
+        Generates (name, lstat dictionary) pairs for the data objects of
+        collection dirname, ordered by name, as query result pages arrive
+        """
         epoch = datetime.datetime(1, 1, 1)
 
         q = self.session.query(DataObject.name, DataObject.owner_name,
@@ -283,13 +725,29 @@ class iRODSCatalogBase(catalog.Catalog):
                                DataObject.modify_time,
                                DataObject.replica_number)
         q = q.filter(Collection.name == dirname)
+        # replicas of an object come as consecutive rows
+        q = q.order_by(DataObject.name)
 
-        ret = {}
+        def _finalize(dobj):
+            minsize = dobj['minsize']
+            maxsize = dobj['maxsize']
+            if maxsize != minsize:
+                dobj['size'] = '{}-{}'.format(minsize, maxsize)
+            else:
+                dobj['size'] = str(minsize)
+
+            return dobj
+
+        name = None
+        dobj = None
         for r in q.get_results():
-            name = r[DataObject.name]
-            dobj = ret.get(name, {'minsize': None, 'maxsize': 0,
-                                  'mtime': epoch, 'isdir': False,
-                                  'nreplicas': 0})
+            if r[DataObject.name] != name:
+                if dobj is not None:
+                    yield name, _finalize(dobj)
+
+                name = r[DataObject.name]
+                dobj = {'minsize': None, 'maxsize': 0, 'mtime': epoch,
+                        'isdir': False, 'nreplicas': 0}
 
             dobj['user'] = r[DataObject.owner_name]
             dobj['nreplicas'] += 1
@@ -303,17 +761,11 @@ class iRODSCatalogBase(catalog.Catalog):
             if size > dobj['maxsize']:
                 dobj['maxsize'] = size
 
-            ret[name] = dobj
+        if dobj is not None:
+            yield name, _finalize(dobj)
 
-        for k, v in ret.items():
-            minsize = v['minsize']
-            maxsize = v['maxsize']
-            if maxsize != minsize:
-                v['size'] = '{}-{}'.format(minsize, maxsize)
-            else:
-                v['size'] = str(minsize)
-
-        return ret
+    def lstat_files(self, dirname):
+        return dict(self.files_entries(dirname))
 
     def lstat_file(self, path):
         dirname, basename = self.splitname(path)
@@ -349,18 +801,33 @@ class iRODSCatalogBase(catalog.Catalog):
 
     @method_translate_exceptions
     def listdir(self, path):
-        q = self.session.query(DataObject.name).filter(Collection.name == path)
-        files = [r[DataObject.name] for r in q.all()]
-
-        q = self.session.query(Collection.name) \
-            .filter(Collection.parent_name == path)
-        colls = [self.basename(c[Collection.name]) for c in q.all()]
-
+        """
+        Lists a collection with one query for its sub-collections and one for
+        its data objects (replicas)
+        """
         ret = self.lstat_dirs(path)
         ret.update(self.lstat_files(path))
 
         return ret
 
+    def listdir_pages(self, path, page_size=1000):
+        """
+        Generates a collection contents (see listdir()) by pages of at most
+        page_size entries, sub-collections first, as query results arrive
+        """
+        # queries run while the generator is iterated, not when it is created
+        with translated_exceptions(self):
+            page = {}
+            for name, st in itertools.chain(self.dirs_entries(path),
+                                            self.files_entries(path)):
+                page[name] = st
+                if len(page) >= page_size:
+                    yield page
+                    page = {}
+
+            if page:
+                yield page
+
     @method_translate_exceptions
     def isdir(self, path):
         q = self.session.query(Collection.id).filter(Collection.name == path)
@@ -375,21 +842,128 @@ class iRODSCatalogBase(catalog.Catalog):
     def join(self, *args):
         return '/'.join(args)
 
-    def remote_files_stats(self, file_paths):
+    def _objects_info_query(self):
+        return self.session.query(Collection.name, DataObject.name,
+                                  DataObject.size, DataObject.checksum,
+                                  DataObject.replica_number,
+                                  DataObject.replica_status,
+                                  DataObject.resource_name,
+                                  DataObject.modify_time)
+
+    def _objects_info(self, results, ret):
+        """
+        Accumulates query results rows into ret, a dictionary of info
+        dictionaries indexed by (collection path, object name)
+        """
+        for r in results:
+            key = r[Collection.name], r[DataObject.name]
+            info = ret.setdefault(key, {'replicas': []})
+            info['replicas'].append({
+                'number': int(r[DataObject.replica_number]),
+                'status': r[DataObject.replica_status],
+                'resource_name': r[DataObject.resource_name],
+                'checksum': r[DataObject.checksum] or None,
+                'size': int(r[DataObject.size]),
+                'mtime': r[DataObject.modify_time],
+            })
+
+        for info in ret.values():
+            if 'size' in info:
+                # already finalized
+                continue
+
+            replicas = info['replicas']
+            replicas.sort(key=lambda r: r['number'])
+
+            # reference values come from good replicas first
+            good = [r for r in replicas if r['status'] == '1'] or replicas
+
+            info['size'] = good[0]['size']
+            info['mtime'] = max(r['mtime'] for r in replicas)
+            info['checksum'] = next((r['checksum'] for r in good
+                                     if r['checksum'] is not None), None)
+
+        return ret
+
+    def collection_objects_info(self, path):
+        """
+        Gathers size, checksum, modification time and replicas of every data
+        object in a collection with a single query. Returns a dictionary of
+        info dictionaries indexed by object name.
+        """
+        q = self._objects_info_query().filter(Collection.name == path)
+
+        infos = self._objects_info(q.get_results(), {})
+
+        return {name: info for (_, name), info in infos.items()}
+
+    def remote_tree_manifest(self, path):
+        """
+        Gathers info dictionaries (see collection_objects_info()) of a whole
+        collection tree in a few bulk queries. Returns a dictionary indexed by
+        collection path (including empty sub-collections) of dictionaries
+        indexed by object name.
+        """
+        manifest = {path: {}}
+
+        q = self.session.query(Collection.name)
+        q = q.filter(Like(Collection.name, self.join(path, '%')))
+        for r in q.get_results():
+            manifest[r[Collection.name]] = {}
+
+        infos = {}
+        q = self._objects_info_query()
+        self._objects_info(q.filter(Collection.name == path).get_results(),
+                           infos)
+        q = q.filter(Like(Collection.name, self.join(path, '%')))
+        self._objects_info(q.get_results(), infos)
+
+        for (coll, name), info in infos.items():
+            manifest.setdefault(coll, {})[name] = info
+
+        return manifest
+
+    def remote_tree_counts(self, path):
+        """
+        Counts the data object replicas of every collection of a tree in a few
+        queries. Returns a dictionary of counts indexed by collection path
+        (including empty sub-collections).
+        """
+        counts = {path: 0}
+
+        q = self.session.query(Collection.name)
+        q = q.filter(Like(Collection.name, self.join(path, '%')))
+        for r in q.get_results():
+            counts[r[Collection.name]] = 0
+
+        q = self.session.query(Collection.name, DataObject.id)
+        q = q.count(DataObject.id)
+        for qf in [q.filter(Collection.name == path),
+                   q.filter(Like(Collection.name, self.join(path, '%')))]:
+            for r in qf.get_results():
+                counts[r[Collection.name]] = int(r[DataObject.id])
+
+        return counts
+
+    def remote_files_info(self, file_paths):
+        """
+        Returns info dictionaries (see collection_objects_info()) for a file
+        list, with one query per parent collection
+        """
         dirs = {self.dirname(p) for p in file_paths}
 
-        stats = {}
+        infos = {}
         for d in dirs:
-            q = self.session.query(DataObject.name, DataObject.size)
-            q = q.filter(Collection.name == d)
+            for name, info in self.collection_objects_info(d).items():
+                infos[self.join(d, name)] = info
 
-            for r in q.get_results():
-                stats[self.join(d, r[DataObject.name])] = \
-                  int(r[DataObject.size])
+        return {p: infos[p] for p in file_paths if p in infos}
 
-        return (len(file_paths),
-                sum([v for k, v in stats.items() if k in file_paths]),
-                stats)
+    def remote_files_stats(self, file_paths):
+        infos = self.remote_files_info(file_paths)
+        stats = {p: info['size'] for p, info in infos.items()}
+
+        return len(file_paths), sum(stats.values()), stats
 
     def remote_trees_stats(self, dirs):
         nfiles = 0
@@ -422,28 +996,85 @@ class iRODSCatalogBase(catalog.Catalog):
 
     @method_translate_exceptions
     def download_files(self, pathlist, destdir, osl):
-        nfiles, size, stats = self.remote_files_stats(pathlist)
+        infos = self.remote_files_info(pathlist)
+        sizes = {p: info['size'] for p, info in infos.items()}
+        nfiles, size = len(pathlist), sum(sizes.values())
 
-        def cancel(f):
-            print_('interrupted: delete', f)
-            os.unlink(f)
-
-        cksum_factor = self.cksum_factor()
-        size *= cksum_factor
-        stats = {k : (s * cksum_factor) for k, s in stats.items()}
-        osl.update_list(pathlist, size=stats, cancel=cancel)
+        # checksums are computed on the fly: data is only counted once
+        osl.update_list(pathlist, size=sizes, cancel=self._download_cancel)
 
         if nfiles > 1 or size > self.BUFFER_SIZE:
             # wake up progress bar for more than one file or one large file
             yield 0, size
 
         completed = 0
-        for y in self._download_files(pathlist, destdir, osl):
+        for y in self._download_files(pathlist, destdir, osl, infos):
             completed += y
             yield completed, size
 
-    def _download_files(self, pathlist, destdir, osl, status_path=None):
-        def _download(obj, file, **options):
+    def _download_files(self, pathlist, destdir, osl, infos=None,
+                        status_path=None):
+        infos = infos or {}
+        targets = ((p, os.path.join(destdir, self.basename(p)), infos.get(p))
+                   for p in pathlist)
+
+        for y in self._download_targets(targets, osl, status_path):
+            yield y
+
+    def _local_up_to_date(self, file, info):
+        """
+        Returns wether local file matches remote object info (same size, not
+        older, and same checksum if available and local checksums are enabled)
+        """
+        try:
+            st = os.stat(file)
+        except OSError:
+            return False
+
+        if st.st_size != info['size']:
+            return False
+
+        if catalog_timestamp(info['mtime']) > int(st.st_mtime):
+            return False
+
+        if self.local_checksum and info['checksum'] is not None:
+            algorithm = self.cksum_algorithm_ref(info['checksum'])
+            local_cksum = None
+            for _, local_cksum in self.local_file_cksum(file, algorithm):
+                pass
+
+            return local_cksum == info['checksum']
+
+        return True
+
+    def _download_targets(self, targets, osl, status_path=None, sync=False):
+        """
+        Downloads (object path, local file, info) triples from the targets
+        iterable using a pool of transfer_threads workers, each worker
+        transferring through its own pooled connection. info is the
+        prefetched object info (see collection_objects_info()) or None when
+        unknown.
+
+        In sync mode, local files matching their object info are skipped and
+        downloaded files get the remote modification time.
+        """
+        def _download_range(obj, file, offset, length, options,
+                            record=None):
+            with open(file, 'r+b') as f, \
+                    self.dom.open(obj, 'r', **options) as o:
+                f.seek(offset)
+                o.seek(offset)
+
+                for chunk in self.tuner.chunks(o, length):
+                    f.write(chunk)
+                    if record is not None:
+                        # record data safely handed to the OS
+                        f.flush()
+                        record(len(chunk))
+
+                    yield len(chunk)
+
+        def _download(obj, file, info, options):
             # adapted from https://github.com/irods/python-irodsclient
             # data_object_manager.py#L29
 
@@ -451,48 +1082,261 @@ class iRODSCatalogBase(catalog.Catalog):
             if os.path.exists(file) and kw.FORCE_FLAG_KW not in options:
                 raise ex.OVERWRITE_WITHOUT_FORCE_FLAG
 
-            with open(file, 'wb') as f, self.dom.open(obj, 'r', **options) as o:
-                for chunk in chunks(o, self.BUFFER_SIZE):
-                    f.write(chunk)
-                    yield len(chunk)
+            size = None
+            if info is not None:
+                size = info['size']
 
-            obj_cksum = self.dom.get(obj).checksum
+                if sync and self._local_up_to_date(file, info):
+                    print_('up to date', file)
+                    yield size
+                    return
+
+            obj_cksum = None
             if self.local_checksum:
-                obj_cksum = self.dom.get(obj).checksum
+                if info is not None:
+                    obj_cksum = info['checksum']
+                else:
+                    obj_cksum = self.dom.get(obj).checksum
+
+                if obj_cksum is None:
+                    print_('checksum is None')
+
+            replica = self.source_replica(info)
+            if replica is not None:
+                print_('read replica', replica['number'], 'from',
+                       replica['resource_name'])
+                options = dict(options)
+                options[kw.REPL_NUM_KW] = str(replica['number'])
+
+            # only multi-chunk objects are worth resuming
+            resume = (self.resume_downloads and size is not None and
+                      size > self.BUFFER_SIZE)
+
+            yield self.WRITING
+
+            parallel = self.is_parallel(size)
+            if parallel:
+                split = self.byte_ranges(size)
+            else:
+                split = [(0, size)]
+
+            target = file
+            ranges = [[o, l, 0] for o, l in split]
+            if resume:
+                target = file + self.PARTIAL_SUFFIX
+                state = {'object': obj, 'size': size,
+                         'checksum': obj_cksum,
+                         'mtime': str(info['mtime'])}
+                ranges = self._resume_ranges(file, state, split)
+                state['ranges'] = ranges
+                self._write_resume_state(file, state)
+
+                state_lock = threading.Lock()
+
+            def _recorder(r):
+                # returns a function accounting for bytes written in range r
+                # in the resume state
+                if not resume:
+                    return None
+
+                def _record(n):
+                    with state_lock:
+                        r[2] += n
+                        self._write_resume_state(file, state)
+
+                return _record
+
+            local_cksum = None
+            if parallel:
+                done = sum(d for _, _, d in ranges)
+                if done:
+                    print_('resume', obj, 'with', done, 'bytes done')
+                    yield done
+
+                with open(target, 'r+b' if done else 'wb') as f:
+                    f.truncate(size)
+
+                start = time.time()
+                tasks = ((tuple(r), _download_range,
+                          (obj, target, r[0] + r[2], r[1] - r[2], options,
+                           _recorder(r)))
+                         for r in ranges if r[2] < r[1])
+                for y in self._parallel_ranges(tasks):
+                    yield y
+
+                self._record_replica_read(replica, size - done,
+                                          time.time() - start)
+
+                if obj_cksum is not None:
+                    # ranges arrive out of order: hash the file afterwards,
+                    # its size was already accounted for in progress
+                    h = hashlib.new(self.cksum_algorithm_ref(obj_cksum))
+                    with open(target, 'rb') as f:
+                        for chunk in read_views(f, self.BUFFER_SIZE):
+                            h.update(chunk)
+                            yield 0
+
+                    local_cksum = self.cksum_digest(h)
+            else:
+                # hash chunks as they are written, no extra disk pass
+                h = None
                 if obj_cksum is not None:
-                    local_cksum = None
-                    for l, local_cksum in self.local_file_cksum_ref(file,
-                                                                    obj_cksum):
+                    h = hashlib.new(self.cksum_algorithm_ref(obj_cksum))
+
+                # a single sequential range resumes from the data written
+                # contiguously, whatever the split of previous downloads
+                offset = 0
+                if resume:
+                    offset = self.contiguous_done(ranges)
+                    ranges[:] = [[0, size, offset]]
+                    self._write_resume_state(file, state)
+
+                if offset:
+                    print_('resume', obj, 'at', offset)
+
+                    if h is not None:
+                        # hash the part downloaded previously
+                        with open(target, 'rb') as f:
+                            for chunk in read_views(f, self.BUFFER_SIZE,
+                                                    offset):
+                                h.update(chunk)
+                                yield 0
+
+                    yield offset
+
+                record = _recorder(ranges[0])
+
+                start = time.time()
+                received = 0
+                with open(target, 'r+b' if offset else 'wb') as f, \
+                        self.dom.open(obj, 'r', **options) as o:
+                    if offset:
+                        f.truncate(offset)
+                        f.seek(offset)
+                        o.seek(offset)
+
+                    for chunk in self.tuner.chunks(o):
+                        f.write(chunk)
+                        if h is not None:
+                            h.update(chunk)
+
+                        if record is not None:
+                            # record data safely handed to the OS
+                            f.flush()
+                            record(len(chunk))
+
+                        received += len(chunk)
+                        yield len(chunk)
 
-                        yield l
+                self._record_replica_read(replica, received,
+                                          time.time() - start)
 
-                    if local_cksum != obj_cksum:
-                        # FIXME: delete local file?
-                        msg = 'Downloaded file has an incorrect checksum ' \
-                              '(local=\'{}\', ' \
-                              'catalog=\'{}\')'.format(local_cksum, obj_cksum)
-                        raise exceptions.ChecksumError(msg)
-                    else:
-                        print_('checksum ok', local_cksum)
+                if h is not None:
+                    local_cksum = self.cksum_digest(h)
+
+            if resume:
+                if obj_cksum is not None and local_cksum != obj_cksum:
+                    # corrupted partial file: start over next time
+                    self._discard_partial_download(file)
                 else:
-                    print_('checksum is None')
+                    os.rename(target, file)
+                    os.unlink(file + self.RESUME_SUFFIX)
+
+            if obj_cksum is not None:
+                if local_cksum != obj_cksum:
+                    # FIXME: delete local file?
+                    msg = 'Downloaded file has an incorrect checksum ' \
+                          '(local=\'{}\', ' \
+                          'catalog=\'{}\')'.format(local_cksum, obj_cksum)
+                    raise exceptions.ChecksumError(msg)
+                else:
+                    print_('checksum ok', local_cksum)
+
+            if sync and info is not None:
+                mtime = catalog_timestamp(info['mtime'])
+                os.utime(file, (mtime, mtime))
+
+            if obj_cksum is not None:
+                # after utime, which changes the cache key
+                self.remember_cksum(file, self.cksum_algorithm_ref(obj_cksum),
+                                    local_cksum)
 
         options = {kw.FORCE_FLAG_KW: ''}
 
-        for p in pathlist:
-            print_('get', p, destdir)
+        tasks = (((p, destfile), _download, (p, destfile, info, options))
+                 for p, destfile, info in targets)
+
+        with WorkerPool(self.transfer_threads, tasks,
+                        self.tuner.active_workers) as pool:
+            for event, key, value in pool:
+                if event == WorkerPool.ERROR:
+                    six.reraise(*value)
+
+                p, destfile = key
+                sp = status_path or p
+
+                if event == WorkerPool.START:
+                    print_('get', p, destfile)
+                    if osl[sp].status == osl[sp].NEW:
+                        osl[sp].in_progress(None)
+                elif event == WorkerPool.YIELD:
+                    if value is self.WRITING:
+                        # files skipped in sync mode are left alone
+                        osl[sp].element_started(destfile)
+                        continue
+
+                    osl[sp].progress += value
+                    yield value
+                elif event == WorkerPool.DONE:
+                    osl[sp].element_done(destfile)
+                    if sp == p:
+                        osl[p].done()
+
+    @method_translate_exceptions
+    def download_archive(self, pathlist, archive, osl):
+        """
+        Streams collection trees into a local tar, tar.gz or zip archive
+        (depending on its extension), reading data objects straight into
+        archive members without intermediate files
+        """
+        _, size, stats = self.remote_trees_stats(pathlist)
+        osl.update_list(pathlist, size=stats, cancel=self._download_cancel)
+
+        writer = archives.open_archive_writer(archive)
+
+        completed = 0
+        try:
+            for d in pathlist:
+                osl[d].in_progress(archive)
+
+                root = self.basename(d)
+                for coll, name, osize, mtime in self._tree_members(d):
+                    member = root + coll[len(d):]
+                    mtime = catalog_timestamp(mtime)
+
+                    if name is None:
+                        writer.add_directory(member, mtime)
+                        continue
 
-            destfile = os.path.join(destdir, self.basename(p))
-            sp = status_path or p
-            osl[sp].in_progress(destfile)
-            for y in _download(p, destfile, **options):
-                osl[sp].progress += y
-                yield y
+                    member = self.join(member, name)
+                    with self.dom.open(self.join(coll, name), 'r') as f, \
+                            writer.add_file(member, osize, mtime) as m:
+                        for chunk in read_views(f, self.BUFFER_SIZE, osize):
+                            m.write(chunk)
 
-            if sp == p:
-                osl[p].done()
+                            osl[d].progress += len(chunk)
+                            completed += len(chunk)
+                            yield completed, size
 
-    def _download_coll(self, coll, destdir, osl, status_path):
+                osl[d].done()
+        finally:
+            writer.close()
+
+    def _download_coll_targets(self, coll, destdir):
+        """
+        Walks a collection tree, creating local directories on the way, and
+        generates (object path, local file, info) triples to download
+        """
         destdir = os.path.join(destdir, coll.name)
         try:
             os.makedirs(destdir)
@@ -500,37 +1344,90 @@ class iRODSCatalogBase(catalog.Catalog):
             if not os.path.isdir(destdir):
                 raise
 
-        query = self.session.query(DataObject.name)\
-            .filter(Collection.name == coll.path)
-
-        results = query.get_results()
-
-        pathlist = [self.join(coll.path, r[DataObject.name]) for r in results]
-        for y in self._download_files(pathlist, destdir, osl, status_path):
-            yield y
+        for name, info in self.collection_objects_info(coll.path).items():
+            yield (self.join(coll.path, name), os.path.join(destdir, name),
+                   info)
 
         for subcoll in coll.subcollections:
-            for y in self._download_coll(subcoll, destdir, osl, status_path):
-                yield y
+            for t in self._download_coll_targets(subcoll, destdir):
+                yield t
 
     @method_translate_exceptions
     def download_directories(self, pathlist, destdir, osl):
         nfiles, size, stats = self.remote_trees_stats(pathlist)
 
-        def cancel(f):
-            print_('interrupted: delete', f)
-            os.unlink(f)
-
-        cksum_factor = self.cksum_factor()
-        size *= cksum_factor
-        stats = {k : (s * cksum_factor) for k, s in stats.items()}
-        osl.update_list(pathlist, size=stats, cancel=cancel)
+        # checksums are computed on the fly: data is only counted once
+        osl.update_list(pathlist, size=stats, cancel=self._download_cancel)
 
         completed = 0
         for p in pathlist:
             coll = self.cm.get(p)
             osl[p].in_progress(None)
-            for y in self._download_coll(coll, destdir, osl, p):
+            targets = self._download_coll_targets(coll, destdir)
+            for y in self._download_targets(targets, osl, p):
+                completed += y
+                yield completed, size
+
+            osl[p].done()
+
+    def _sync_targets(self, path, manifest, destdir, delete_extra):
+        """
+        Creates the local directories of a collection tree manifest (see
+        remote_tree_manifest()), optionally deletes local entries absent from
+        the catalog, and generates (object path, local file, info) triples to
+        synchronize
+        """
+        root = os.path.join(destdir, self.basename(path))
+
+        for coll in sorted(manifest):
+            objects = manifest[coll]
+            ldir = os.path.join(root, *coll[len(path):].split('/'))
+
+            try:
+                os.makedirs(ldir)
+            except OSError:
+                if not os.path.isdir(ldir):
+                    raise
+
+            if delete_extra:
+                subcolls = {self.basename(c) for c in manifest
+                            if self.dirname(c) == coll}
+                kept = set(objects) | subcolls
+                # keep partial downloads of remote objects
+                kept |= {n + suffix for n in objects
+                         for suffix in (self.PARTIAL_SUFFIX,
+                                        self.RESUME_SUFFIX)}
+
+                for name in os.listdir(ldir):
+                    if name in kept:
+                        continue
+
+                    extra = os.path.join(ldir, name)
+                    print_('delete local extra', extra)
+                    if os.path.isdir(extra) and not os.path.islink(extra):
+                        shutil.rmtree(extra)
+                    else:
+                        os.unlink(extra)
+
+            for name, info in objects.items():
+                yield self.join(coll, name), os.path.join(ldir, name), info
+
+    @method_translate_exceptions
+    def sync_directories(self, pathlist, destdir, osl, delete_extra=False):
+        manifests = {p: self.remote_tree_manifest(p) for p in pathlist}
+        stats = {p: sum(info['size'] for objects in m.values()
+                        for info in objects.values())
+                 for p, m in manifests.items()}
+        size = sum(stats.values())
+
+        osl.update_list(pathlist, size=stats, cancel=self._download_cancel)
+
+        completed = 0
+        for p in pathlist:
+            osl[p].in_progress(None)
+            targets = self._sync_targets(p, manifests[p], destdir,
+                                         delete_extra)
+            for y in self._download_targets(targets, osl, p, sync=True):
                 completed += y
                 yield completed, size
 
@@ -540,14 +1437,10 @@ class iRODSCatalogBase(catalog.Catalog):
     def upload_files(self, files, path, osl):
         nfiles, size, stats = local_files_stats(files)
 
-        def cancel(f):
-            print_('interrupted: delete', f)
-            self.dom.unlink(f, force=True)
-
         cksum_factor = self.cksum_factor()
         size *= cksum_factor
         stats = {k : (s * cksum_factor) for k, s in stats.items()}
-        osl.update_list(files, size=stats, cancel=cancel)
+        osl.update_list(files, size=stats, cancel=self._upload_cancel)
 
         completed = 0
         for s in self._upload_files(files, path, osl):
@@ -555,7 +1448,110 @@ class iRODSCatalogBase(catalog.Catalog):
             yield completed, size
 
     def _upload_files(self, files, path, osl, status_path=None):
-        def _put(file, obj, **options):
+        if not path.endswith('/'):
+            path = path + '/'
+
+        targets = ((f, path + os.path.basename(f), None) for f in files)
+
+        for y in self._upload_targets(self._bundle_targets(targets), osl,
+                                      status_path):
+            yield y
+
+    def _bundle_target(self, files, coll):
+        if len(files) == 1:
+            # not worth a bundle
+            return files[0], self.join(coll, os.path.basename(files[0])), None
+
+        name = self.BUNDLE_PREFIX + uuid.uuid4().hex + '.tar'
+        return files, self.join(coll, name), None
+
+    def _bundle_targets(self, targets):
+        """
+        Groups small files of consecutive (local file, object path, info)
+        upload triples targeting the same collection into bundle triples,
+        where local file is replaced by a list of files and object path is
+        the bundle object path. Files updating an existing object are never
+        bundled.
+        """
+        if self.bundle_threshold <= 0:
+            for t in targets:
+                yield t
+            return
+
+        coll, bundle, bundle_size = None, [], 0
+        for f, irods_path, info in targets:
+            dirname = self.dirname(irods_path)
+            if bundle and dirname != coll:
+                yield self._bundle_target(bundle, coll)
+                bundle, bundle_size = [], 0
+
+            size = os.path.getsize(f)
+            if info is not None or not self.is_bundled(size):
+                yield f, irods_path, info
+                continue
+
+            coll = dirname
+            bundle.append(f)
+            bundle_size += size
+
+            if (len(bundle) >= self.BUNDLE_MAX_FILES or
+                    bundle_size >= self.BUNDLE_MAX_SIZE):
+                yield self._bundle_target(bundle, coll)
+                bundle, bundle_size = [], 0
+
+        if bundle:
+            yield self._bundle_target(bundle, coll)
+
+    def _remote_up_to_date(self, file, info):
+        """
+        Returns wether remote object info matches local file (same size, and
+        same checksum if registered, or else remote not older)
+        """
+        st = os.stat(file)
+
+        if st.st_size != info['size']:
+            return False
+
+        if info['checksum'] is None:
+            return catalog_timestamp(info['mtime']) >= int(st.st_mtime)
+
+        algorithm = self.cksum_algorithm_ref(info['checksum'])
+        local_cksum = None
+        for _, local_cksum in self.local_file_cksum(file, algorithm):
+            pass
+
+        return local_cksum == info['checksum']
+
+    def _upload_targets(self, targets, osl, status_path=None):
+        """
+        Uploads (local file, object path, info) triples from the targets
+        iterable using a pool of transfer_threads workers, each worker
+        transferring through its own pooled connection. info is the info of
+        the existing remote object (see collection_objects_info()) in sync
+        mode, None otherwise: objects matching their local file are skipped.
+
+        Local file may also be a list of small files, uploaded as a single tar
+        object extracted by the server in its collection (see
+        _bundle_targets()).
+        """
+        def _write_range(f, o, offset, length, record=None):
+            f.seek(offset)
+            o.seek(offset)
+
+            for chunk in self.tuner.chunks(f, length):
+                o.write(chunk)
+                if record is not None:
+                    record(len(chunk))
+
+                yield len(chunk)
+
+        def _put_range(file, obj, offset, length, options, record=None):
+            with open(file, 'rb') as f, \
+                    self.dom.open(obj, 'r+', **options) as o:
+                for y in _write_range(f, o, offset, length, record):
+                    yield y
+
+        def _put(file, obj, resumable=True, **options):
             # adapted from https://github.com/irods/python-irodsclient
             # data_object_manager.py#L60
 
@@ -563,14 +1559,90 @@ class iRODSCatalogBase(catalog.Catalog):
             if kw.OPR_TYPE_KW not in options:
                 options[kw.OPR_TYPE_KW] = 1  # PUT_OPR
 
+            size = os.path.getsize(file)
+
+            # only multi-chunk files are worth resuming
+            resume = (resumable and self.resume_uploads and
+                      size > self.BUFFER_SIZE)
+
+            if self.is_parallel(size):
+                split = self.byte_ranges(size)
+            else:
+                split = [(0, size)]
+
+            ranges = [[o, l, 0] for o, l in split]
+            if resume:
+                ranges = self._upload_resume_ranges(file, obj, split)
+                self._write_upload_state(file, obj, ranges)
+
+                state_lock = threading.Lock()
+
+            def _recorder(r):
+                # returns a function accounting for bytes written in range r
+                # in the upload state
+                if not resume:
+                    return None
+
+                def _record(n):
+                    with state_lock:
+                        r[2] += n
+                        self._write_upload_state(file, obj, ranges)
+
+                return _record
+
+            done = sum(d for _, _, d in ranges)
+
+            yield self.WRITING
+
             with open(file, 'rb') as f:
                 closed = False
-                o = self.dom.open(obj, 'w', **options)
+                o = self.dom.open(obj, 'r+' if done else 'w', **options)
 
                 try:
-                    for chunk in chunks(f, self.BUFFER_SIZE):
-                        o.write(chunk)
-                        yield len(chunk)
+                    range_options = None
+                    if len(ranges) > 1:
+                        range_options = self._parallel_open_options(o)
+
+                    if range_options is not None:
+                        if done:
+                            print_('resume', obj, 'with', done, 'bytes done')
+                            yield done
+
+                        # first range goes through the main handle, which is
+                        # closed (and checksummed) last
+                        first = ranges[0]
+                        tasks = [(tuple(first), _write_range,
+                                  (f, o, first[0] + first[2],
+                                   first[1] - first[2], _recorder(first)))]
+                        tasks += [(tuple(r), _put_range,
+                                   (file, obj, r[0] + r[2], r[1] - r[2],
+                                    range_options, _recorder(r)))
+                                  for r in ranges[1:] if r[2] < r[1]]
+                        for y in self._parallel_ranges(tasks):
+                            yield y
+                    else:
+                        # a single stream resumes from the data written
+                        # contiguously, whatever the split of previous uploads
+                        offset = 0
+                        if resume:
+                            offset = self.contiguous_done(ranges)
+                            ranges[:] = [[0, size, offset]]
+                            self._write_upload_state(file, obj, ranges)
+
+                        if offset:
+                            # continue after the partial replica contents
+                            print_('resume', obj, 'at', offset)
+                            f.seek(offset)
+                            o.seek(offset)
+                            yield offset
+
+                        record = _recorder(ranges[0])
+                        for chunk in self.tuner.chunks(f):
+                            o.write(chunk)
+                            if record is not None:
+                                record(len(chunk))
+
+                            yield len(chunk)
                 except GeneratorExit:
                     # generator was interrupted
 
@@ -588,123 +1660,475 @@ class iRODSCatalogBase(catalog.Catalog):
                     if not closed:
                         o.close()
 
+            if resume:
+                self._discard_upload_state(obj)
+
 #            if kw.ALL_KW in options:
 #                options[kw.UPDATE_REPL_KW] = ''
 #                self.dom.replicate(obj, **options)
 
-        if not path.endswith('/'):
-            path = path + '/'
-
-        options = {
-            kw.ALL_KW: '',
-            kw.UPDATE_REPL_KW: '',
-        }
+        def _upload(file, obj, info):
+            if info is not None and self._remote_up_to_date(file, info):
+                print_('up to date', obj)
+                yield os.path.getsize(file) * self.cksum_factor()
+                return
 
-        if self.default_resc is not None:
-            options[kw.DEST_RESC_NAME_KW] = self.default_resc
+            # options are per file since checksum is file specific
+            options = {
+                kw.ALL_KW: '',
+                kw.UPDATE_REPL_KW: '',
+            }
 
-        for f in files:
-            basename = os.path.basename(f)
-            irods_path = path + basename
-            print_('put', f, path, irods_path)
+            if self.default_resc is not None:
+                options[kw.DEST_RESC_NAME_KW] = self.default_resc
 
-            if os.stat(f).st_size > self.BUFFER_SIZE:
+            if os.stat(file).st_size > self.BUFFER_SIZE:
                 # wake up progress bar before checksum for large files
                 yield 0
 
-            sp = status_path or f
-            osl[sp].in_progress(irods_path)
-
             if self.local_checksum:
                 cksum = None
-                for l, cksum in self.local_file_cksum(f):
-                    osl[sp].progress += l
+                for l, cksum in self.local_file_cksum(file):
                     yield l
                 options[kw.VERIFY_CHKSUM_KW] = cksum
                 print_('cksum', options[kw.VERIFY_CHKSUM_KW])
 
             try:
-                for y in _put(f, irods_path, **options):
-                    osl[sp].progress += y
+                for y in _put(file, obj, **options):
                     yield y
             except irods.exception.USER_CHKSUM_MISMATCH as e:
                 # remove object from catalog?
-                # self.dom.unlink(irods_path, force=True)
+                # self.dom.unlink(obj, force=True)
 
-                # mark failed and reraise
-                os[sp].fail()
+                # do not resume from corrupted contents
+                self._discard_upload_state(obj)
+
+                raise exceptions.CatalogLogicError(e)
+
+        def _send_bundle(bundle_file, bundle):
+            options = {
+                kw.DATA_TYPE_KW: 'tar file',
+            }
+
+            if self.default_resc is not None:
+                options[kw.DEST_RESC_NAME_KW] = self.default_resc
+
+            if self.local_checksum:
+                # temporary file: bypass the checksum cache
+                algorithm = getattr(self.session.pool.account,
+                                    'default_hash_scheme', 'SHA256').lower()
+                scheme = hashlib.new(algorithm)
+                with open(bundle_file, 'rb') as f:
+                    for chunk in read_views(f, self.BUFFER_SIZE):
+                        scheme.update(chunk)
+                        yield len(chunk)
+                options[kw.VERIFY_CHKSUM_KW] = self.cksum_digest(scheme)
 
+            try:
+                for y in _put(bundle_file, bundle, resumable=False,
+                              **options):
+                    yield y
+            except irods.exception.USER_CHKSUM_MISMATCH as e:
                 raise exceptions.CatalogLogicError(e)
 
-            if sp == f:
-                osl[f].done()
+        def _upload_bundle(files, bundle):
+            coll = self.dirname(bundle)
 
-    def _upload_dir(self, dir_, path, osl, status_path=None):
-        files = []
+            # progress is accounted in bundled files size
+            total = sum(os.path.getsize(f) for f in files)
+            total *= self.cksum_factor()
+            reported = 0
+
+            bundle_file = self._make_bundle(files)
+            try:
+                bundle_total = os.path.getsize(bundle_file)
+                bundle_total *= self.cksum_factor()
+
+                sent = 0
+                for l in _send_bundle(bundle_file, bundle):
+                    if l is self.WRITING:
+                        yield l
+                        continue
+
+                    sent += l
+                    progress = min(total, sent * total // bundle_total)
+                    yield progress - reported
+                    reported = progress
+            finally:
+                os.unlink(bundle_file)
+
+            options = {
+                kw.FORCE_FLAG_KW: '',
+            }
+
+            if self.default_resc is not None:
+                options[kw.DEST_RESC_NAME_KW] = self.default_resc
+
+            try:
+                self.dom.extract_bundle(bundle, coll, **options)
+            except irods.exception.iRODSException as e:
+                print_('bundle extraction refused', bundle, e)
+                self.bundles_refused = True
+                extracted = False
+            else:
+                extracted = True
+
+            try:
+                self.dom.unlink(bundle, force=True)
+            except irods.exception.iRODSException as e:
+                print_('cannot delete', bundle, e)
+
+            if extracted:
+                yield total - reported
+                return
+
+            # fall back to uploading files one by one, not reporting again
+            # the progress already reported for the bundle
+            for f in files:
+                for y in _upload(f, self.join(coll, os.path.basename(f)),
+                                 None):
+                    if y is self.WRITING:
+                        continue
+
+                    y, reported = max(0, y - reported), max(0, reported - y)
+                    if y:
+                        yield y
+
+        def _task(f, irods_path, info):
+            if isinstance(f, list):
+                return (f, irods_path), _upload_bundle, (f, irods_path)
+
+            return (f, irods_path), _upload, (f, irods_path, info)
+
+        tasks = (_task(*t) for t in targets)
+
+        with WorkerPool(self.transfer_threads, tasks,
+                        self.tuner.active_workers) as pool:
+            for event, key, value in pool:
+                if event == WorkerPool.ERROR and key is None:
+                    six.reraise(*value)
+
+                f, irods_path = key
+
+                # bundle files are accounted in their own status unless
+                # status_path is given
+                if status_path is not None:
+                    statuses = [osl[status_path]]
+                elif isinstance(f, list):
+                    statuses = [osl[x] for x in f]
+                else:
+                    statuses = [osl[f]]
+
+                if event == WorkerPool.ERROR:
+                    for st in statuses:
+                        st.element_done(irods_path)
+                        if status_path is None:
+                            # mark failed
+                            st.fail()
+
+                    six.reraise(*value)
+
+                if event == WorkerPool.START:
+                    if isinstance(f, list):
+                        print_('put', len(f), 'files bundle', irods_path)
+                    else:
+                        print_('put', f, irods_path)
+                    for st in statuses:
+                        if st.status == st.NEW:
+                            st.in_progress(None)
+                elif event == WorkerPool.YIELD:
+                    if value is self.WRITING:
+                        # objects skipped in sync mode are left alone
+                        for st in statuses:
+                            st.element_started(irods_path)
+                        continue
+
+                    # fill bundle files statuses in turn
+                    remaining = value
+                    for st in statuses[:-1]:
+                        n = min(remaining, max(0, st.size - st.progress))
+                        st.progress += n
+                        remaining -= n
+                    statuses[-1].progress += remaining
+                    yield value
+                elif event == WorkerPool.DONE:
+                    for st in statuses:
+                        st.element_done(irods_path)
+                        if status_path is None:
+                            st.done()
+
+    def _upload_dir_targets(self, dir_, path, manifest=None):
+        """
+        Walks a local directory tree, creating collections on the way, and
+        generates (local file, object path, info) triples to upload. Files are
+        only generated once their collection has been created.
+
+        In sync mode, manifest is the remote tree manifest (see
+        remote_tree_manifest()) used to skip existing collections and to
+        provide existing objects info.
+        """
         subdirs = []
 
-        try:
-            self.cm.create(path)
-        except irods.exception.CATALOG_ALREADY_HAS_ITEM_BY_THAT_NAME:
-            pass
+        objects = {}
+        if manifest is not None and path in manifest:
+            objects = manifest[path]
+        else:
+            try:
+                self.cm.create(path)
+            except irods.exception.CATALOG_ALREADY_HAS_ITEM_BY_THAT_NAME:
+                pass
 
         for name in os.listdir(dir_):
             abspath = os.path.join(dir_, name)
             if os.path.isdir(abspath):
                 subdirs.append((abspath, name))
             else:
-                files.append(abspath)
-
-        for y in self._upload_files(files, path, osl, status_path):
-            yield y
+                yield abspath, self.join(path, name), objects.get(name)
 
         for abspath, name in subdirs:
             cpath = self.join(path, name)
 
-            for y in self._upload_dir(abspath, cpath, osl, status_path):
-                yield y
+            for t in self._upload_dir_targets(abspath, cpath, manifest):
+                yield t
 
     @method_translate_exceptions
-    def upload_directories(self, dirs, path, osl):
+    def upload_directories(self, dirs, path, osl, sync=False):
         nfiles, size, stats = local_trees_stats(dirs)
 
-        def cancel(f):
-            print_('interrupted: delete', f)
-            self.dom.unlink(f, force=True)
-
         cksum_factor = self.cksum_factor()
         size *= cksum_factor
         stats = {k : (s * cksum_factor) for k, s in stats.items()}
-        osl.update_list(dirs, size=stats, cancel=cancel)
+        osl.update_list(dirs, size=stats, cancel=self._upload_cancel)
 
         completed = 0
         for d in dirs:
             name = os.path.basename(d)
             cpath = self.join(path, name)
 
+            manifest = None
+            if sync:
+                manifest = self.remote_tree_manifest(cpath)
+                if not self.isdir(cpath):
+                    # destination collection does not exist yet
+                    del manifest[cpath]
+
             osl[d].in_progress(None)
-            for s in self._upload_dir(d, cpath, osl, d):
+            targets = self._upload_dir_targets(d, cpath, manifest)
+            targets = self._bundle_targets(targets)
+            for s in self._upload_targets(targets, osl, d):
                 completed += s
                 yield completed, size
 
             osl[d].done()
 
+    def sync_upload_directories(self, dirs, path, osl):
+        return self.upload_directories(dirs, path, osl, sync=True)
+
+    def _create_collections(self, coll, created):
+        # creates coll and its missing parents, created being the set of
+        # collections known to exist
+        if coll in created:
+            return
+
+        self._create_collections(self.dirname(coll), created)
+
+        try:
+            self.cm.create(coll)
+        except irods.exception.CATALOG_ALREADY_HAS_ITEM_BY_THAT_NAME:
+            pass
+
+        created.add(coll)
+
+    def registered_checksum(self, obj):
+        """
+        Returns the checksum registered in the catalog for data object obj
+        (from its good replicas first), or None
+        """
+        dirname, basename = self.splitname(obj)
+        q = self._objects_info_query().filter(Collection.name == dirname)
+        q = q.filter(DataObject.name == basename)
+
+        info = self._objects_info(q.get_results(), {}).get((dirname,
+                                                             basename))
+        if info is None:
+            return None
+
+        return info['checksum']
+
+    def _put_stream(self, stream, obj):
+        """
+        Writes a readable stream to data object obj, yielding the size of
+        each chunk. When local_checksum is set, the checksum of the written
+        data (in the session default hash scheme) is compared with the one the
+        server registers when closing the object, if it uses the same scheme.
+        """
+        options = {kw.OPR_TYPE_KW: 1}  # PUT_OPR
+        if self.default_resc is not None:
+            options[kw.DEST_RESC_NAME_KW] = self.default_resc
+
+        scheme = None
+        if self.local_checksum:
+            scheme = hashlib.new(getattr(self.session.pool.account,
+                                         'default_hash_scheme',
+                                         'SHA256').lower())
+            # the server computes the checksum while closing the object
+            options[kw.REG_CHKSUM_KW] = ''
+
+        with self.dom.open(obj, 'w', **options) as o:
+            for chunk in self.tuner.chunks(stream):
+                o.write(chunk)
+                if scheme is not None:
+                    scheme.update(chunk)
+                yield len(chunk)
+
+        if scheme is not None:
+            cksum = self.cksum_digest(scheme)
+            remote_cksum = self.registered_checksum(obj)
+            if (remote_cksum is not None and
+                    self.cksum_algorithm_ref(remote_cksum) != scheme.name):
+                print_('cannot verify', obj, 'checksum: server scheme differs',
+                       remote_cksum)
+            elif remote_cksum != cksum:
+                raise exceptions.ChecksumError(
+                    '{}: checksum mismatch ({} != {})'.format(obj, cksum,
+                                                             remote_cksum))
+
     @method_translate_exceptions
-    def delete_files(self, files, osl):
-        number = len(files)
+    def upload_archive(self, archive_files, path, osl):
+        """
+        Uploads the members of local tar (possibly compressed) or zip archives
+        into collection path, writing each one straight to its data object
+        without extracting archives to disk. Collections are created as
+        needed. Progress is accounted in archive bytes read.
+
+        Members whose name escapes path are skipped, and reported together at
+        the end.
+        """
+        stats = {a: os.path.getsize(a) for a in archive_files}
+        size = sum(stats.values())
+        osl.update_list(archive_files, size=stats, cancel=self._upload_cancel)
+
+        failures = []
+        members = 0
+        completed = 0
+        for a in archive_files:
+            created = {path}
+            position = 0
+            skipped = []
+
+            with open(a, 'rb') as f:
+                for name, isdir, _, stream in archives.archive_members(
+                        f, skipped):
+                    members += 1
+                    if not name:
+                        continue
+
+                    target = self.join(path, name)
+                    if isdir:
+                        self._create_collections(target, created)
+                        continue
+
+                    self._create_collections(self.dirname(target), created)
+
+                    print_('upload', name, 'to', target)
+                    osl[a].in_progress(target)
+                    for _ in self._put_stream(stream, target):
+                        # compressed and buffered: progress as archive reads
+                        read = max(position, f.tell()) - position
+                        position += read
+
+                        osl[a].progress += read
+                        completed += read
+                        yield completed, size
+
+                    # uploaded members are not cancelled on failure
+                    osl[a].in_progress(None)
+
+            for name, e in skipped:
+                print_('skip', name, 'from', a, e)
+                failures.append(('{} in {}'.format(name,
+                                                   os.path.basename(a)), e))
+
+            if skipped:
+                osl[a].fail()
+            else:
+                osl[a].done()
+            completed += stats[a] - position
+            yield completed, size
+
+        if failures:
+            raise exceptions.CatalogLogicError(
+                exceptions.OperationFailures('archive member uploads',
+                                             failures,
+                                             members + len(failures)))
+
+    def _apply_concurrently(self, elements, osl, action, verb, operation,
+                            sizes=None):
+        """
+        Calls action(element) for every element concurrently over
+        transfer_threads pooled connections, yielding (current, total)
+        progress in elements or in sizes (a dictionary indexed by element)
+        when given. Failed actions do not stop the others: they are reported
+        together at the end as failed operations.
+        """
+        if sizes is None:
+            sizes = {e: 1 for e in elements}
+        total = sum(sizes[e] for e in elements)
+        osl.update_list(elements, size=sizes)
+
+        def _task(e):
+            action(e)
+            yield sizes[e]
 
-        i = 0
-        for f in files:
-            osl[f].size = 1
-            osl[f].in_progress(None)
+        tasks = ((e, _task, (e, )) for e in elements)
+
+        failures = []
+        completed = 0
+        with WorkerPool(self.transfer_threads, tasks) as pool:
+            for event, e, value in pool:
+                if event == WorkerPool.START:
+                    osl[e].in_progress(None)
+                    continue
+
+                if event == WorkerPool.ERROR:
+                    if e is None:
+                        six.reraise(*value)
+
+                    print_('cannot', verb, e, value[1])
+                    osl[e].fail()
+                    failures.append((e, value[1]))
+                    completed += sizes[e]
+                elif event == WorkerPool.DONE:
+                    osl[e].done()
+                else:
+                    completed += value
+                    continue
+
+                yield completed, total
+
+        if failures:
+            raise exceptions.CatalogLogicError(
+                exceptions.OperationFailures(operation, failures,
+                                             len(elements)))
+
+    @method_translate_exceptions
+    def delete_files(self, files, osl):
+        """
+        Unlinks data objects concurrently over transfer_threads pooled
+        connections. Failed deletions do not stop the others: they are
+        reported together at the end.
+        """
+        def _unlink(f):
             self.dom.unlink(f, force=True)
-            osl[f].done()
-            i += 1
-            yield i, number
+
+        return self._apply_concurrently(files, osl, _unlink, 'delete',
+                                        'deletions')
 
     def _coll_remove_yield(self, path, recurse=True, force=False, **options):
         """
-        interruptible version of CollectionManager.coll_remove() method
+        interruptible version of CollectionManager.coll_remove() method,
+        yielding the number of data objects removed so far (as reported by
+        the server, None when unknown) at each server status message
         """
         if recurse:
             options[kw.RECURSIVE_OPR__KW] = ''
@@ -730,26 +2154,280 @@ class iRODSCatalogBase(catalog.Catalog):
 
             try:
                 while response.int_info == const.SYS_SVR_TO_CLI_COLL_STAT:
+                    try:
+                        stat = response.get_main_message(CollOprStat)
+                        removed = stat.filesCnt
+                    except Exception as e:
+                        # only progress is lost
+                        print_('cannot parse collection status', e)
+                        removed = None
+
                     conn.reply(const.SYS_CLI_TO_SVR_COLL_STAT_REPLY)
-                    yield
+                    yield removed
                     response = conn.recv()
             except GeneratorExit:
                 # destroy connection which is in a bad state (could fix?)
                 conn.release(destroy=True)
 
+    def _removal_plan(self, path, counts, share):
+        """
+        Splits the removal of a collection tree (counts being its
+        remote_tree_counts()) into independent sub-trees weighting at most
+        share (one unit per object replica and per collection), when they
+        have sub-collections.
+
+        Returns a list of (collection, weight) sub-trees, which can be removed
+        concurrently, and a list of (depth, collection, weight) split
+        collections, to be removed once their sub-collections are, deepest
+        first.
+        """
+        children = collections.defaultdict(list)
+        for c in counts:
+            if c != path:
+                children[self.dirname(c)].append(c)
+
+        weights = {}
+        for c in sorted(counts, key=lambda c: c.count('/'), reverse=True):
+            weights[c] = counts[c] + 1 + sum(weights[x] for x in children[c])
+
+        subtrees = []
+        splits = []
+        stack = [(path, 0)]
+        while stack:
+            c, depth = stack.pop()
+            if weights[c] > share and children[c]:
+                splits.append((depth, c, counts[c] + 1))
+                stack.extend((x, depth + 1) for x in children[c])
+            else:
+                subtrees.append((c, weights[c]))
+
+        return subtrees, splits
+
     @method_translate_exceptions
     def delete_directories(self, directories, osl):
-        number = len(directories)
+        """
+        Recursively removes collections. When transfer_threads is more than
+        1, collections and large independent sub-trees are removed
+        concurrently over pooled connections. Progress is accounted in object
+        replicas and collections removed, as the server reports them. Failed
+        removals do not stop the others: they are reported together at the
+        end.
+        """
+        trees = {d: self.remote_tree_counts(d) for d in directories}
+        sizes = {d: sum(c.values()) + len(c) for d, c in trees.items()}
+        osl.update_list(directories, size=sizes)
+
+        total = sum(sizes.values())
+
+        share = total
+        if self.transfer_threads > 1:
+            share = total // (2 * self.transfer_threads)
+
+        subtrees = []
+        splits = []
+        for d in directories:
+            t, s = self._removal_plan(d, trees[d], share)
+            subtrees += [(d, c, w) for c, w in t]
+            splits += [(depth, d, c, w) for depth, c, w in s]
+
+        phases = [subtrees]
+        for depth in sorted({s[0] for s in splits}, reverse=True):
+            phases.append([s[1:] for s in splits if s[0] == depth])
+
+        remaining = collections.Counter(d for phase in phases
+                                        for d, _, _ in phase)
+
+        def _remove(path, weight):
+            # objects are accounted as the server reports them removed, the
+            # rest of the weight once the sub-tree is gone
+            reported = 0
+            for removed in self._coll_remove_yield(path, recurse=True,
+                                                   force=True):
+                n = 0
+                if removed is not None:
+                    n = max(0, min(removed, weight - 1) - reported)
+                    reported += n
+
+                yield n
+
+            yield weight - reported
+
+        failures = []
+        failed = set()
+        completed = 0
+        for phase in phases:
+            tasks = (((d, c), _remove, (c, w)) for d, c, w in phase)
+
+            with WorkerPool(self.transfer_threads, tasks) as pool:
+                for event, key, value in pool:
+                    if event == WorkerPool.ERROR and key is None:
+                        six.reraise(*value)
+
+                    d, c = key
+
+                    if event == WorkerPool.START:
+                        print_('remove', c)
+                        if osl[d].status == osl[d].NEW:
+                            osl[d].in_progress(None)
+                        osl[d].element_started(c)
+                        continue
+
+                    if event == WorkerPool.YIELD:
+                        osl[d].progress += value
+                        completed += value
+                        yield completed, total
+                        continue
+
+                    osl[d].element_done(c)
+
+                    if event == WorkerPool.ERROR:
+                        print_('cannot remove', c, value[1])
+                        failures.append((c, value[1]))
+                        failed.add(d)
+
+                    remaining[d] -= 1
+                    if remaining[d] == 0:
+                        if d in failed:
+                            osl[d].fail()
+                        else:
+                            osl[d].done()
+
+        if failures:
+            raise exceptions.CatalogLogicError(
+                exceptions.OperationFailures('collection removals', failures,
+                                             sum(len(p) for p in phases)))
+
+    @method_translate_exceptions
+    def move_files(self, files, path, osl):
+        """
+        Renames data objects into collection path on the server side
+        """
+        def _move(f):
+            self.dom.move(f, self.join(path, self.basename(f)))
+
+        return self._apply_concurrently(files, osl, _move, 'move', 'moves')
+
+    @method_translate_exceptions
+    def move_directories(self, directories, path, osl):
+        """
+        Renames collections into collection path on the server side
+        """
+        def _move(d):
+            self.cm.move(d, self.join(path, self.basename(d)))
+
+        return self._apply_concurrently(directories, osl, _move, 'move',
+                                        'moves')
+
+    def _copy_options(self):
+        options = {}
+        if self.default_resc is not None:
+            options[kw.DEST_RESC_NAME_KW] = self.default_resc
+
+        return options
+
+    @method_translate_exceptions
+    def copy_files(self, files, path, osl):
+        """
+        Copies data objects into collection path on the server side,
+        concurrently. Progress is accounted in bytes, once each copy is
+        complete.
+        """
+        _, _, stats = self.remote_files_stats(files)
+        sizes = {f: stats.get(f, 0) for f in files}
+
+        def _copy(f):
+            self.dom.copy(f, self.join(path, self.basename(f)),
+                          **self._copy_options())
+
+        return self._apply_concurrently(files, osl, _copy, 'copy', 'copies',
+                                        sizes)
+
+    @method_translate_exceptions
+    def copy_directories(self, directories, path, osl):
+        """
+        Copies collection trees into collection path on the server side.
+        Destination collections are created first, then data objects are
+        copied concurrently over transfer_threads pooled connections.
+        Progress is accounted in bytes. Failed copies do not stop the others:
+        they are reported together at the end.
+        """
+        manifests = {d: self.remote_tree_manifest(d) for d in directories}
+        sizes = {d: sum(info['size'] for objects in m.values()
+                        for info in objects.values())
+                 for d, m in manifests.items()}
+        osl.update_list(directories, size=sizes)
+        total = sum(sizes.values())
+
+        def _targets():
+            for d in directories:
+                dest = self.join(path, self.basename(d))
+
+                for coll in sorted(manifests[d]):
+                    dcoll = dest + coll[len(d):]
+                    try:
+                        self.cm.create(dcoll)
+                    except irods.exception.\
+                            CATALOG_ALREADY_HAS_ITEM_BY_THAT_NAME:
+                        pass
+
+                    for name, info in manifests[d][coll].items():
+                        yield (d, self.join(coll, name), self.join(dcoll, name),
+                               info['size'])
+
+        remaining = {d: sum(len(objects) for objects in m.values())
+                     for d, m in manifests.items()}
+        number = sum(remaining.values())
+
+        def _copy(obj, dest, size):
+            self.dom.copy(obj, dest, **self._copy_options())
+            yield size
+
+        tasks = (((d, obj), _copy, (obj, dest, size))
+                 for d, obj, dest, size in _targets())
+
+        failures = []
+        failed = set()
+        completed = 0
 
-        i = 0
         for d in directories:
-            osl[d].size = 1
             osl[d].in_progress(None)
-            for y in self._coll_remove_yield(d, recurse=True, force=True):
-                yield i, number
-            osl[d].done()
-            i += 1
-            yield i, number
+            if remaining[d] == 0:
+                osl[d].done()
+
+        with WorkerPool(self.transfer_threads, tasks) as pool:
+            for event, key, value in pool:
+                if event == WorkerPool.ERROR and key is None:
+                    six.reraise(*value)
+
+                d, obj = key
+
+                if event == WorkerPool.START:
+                    osl[d].element_started(obj)
+                    continue
+
+                if event == WorkerPool.YIELD:
+                    osl[d].progress += value
+                    completed += value
+                    yield completed, total
+                    continue
+
+                osl[d].element_done(obj)
+
+                if event == WorkerPool.ERROR:
+                    print_('cannot copy', obj, value[1])
+                    failures.append((obj, value[1]))
+                    failed.add(d)
+
+                remaining[d] -= 1
+                if remaining[d] == 0:
+                    if d in failed:
+                        osl[d].fail()
+                    else:
+                        osl[d].done()
+
+        if failures:
+            raise exceptions.CatalogLogicError(
+                exceptions.OperationFailures('copies', failures, number))
 
     @method_translate_exceptions
     def mkdir(self, path):
@@ -924,6 +2602,29 @@ class iRODSCatalogBase(catalog.Catalog):
         return collections.OrderedDict([
             ('local_checksum', form.BooleanField('Perform local checksum:',
                                                  default_value=True)),
+            ('transfer_threads', form.IntegerField('Concurrent transfers:',
+                                                   '4')),
+            ('parallel_threshold',
+             form.IntegerField('Large object threshold (MB):', '512')),
+            ('parallel_streams',
+             form.IntegerField('Streams per large object:', '4')),
+            ('cksum_cache_size',
+             form.IntegerField('Checksum cache entries:', '100000')),
+            ('resume_downloads',
+             form.BooleanField('Resume interrupted downloads:',
+                               default_value=True)),
+            ('resume_uploads',
+             form.BooleanField('Resume interrupted uploads:',
+                               default_value=True)),
+            ('bundle_threshold',
+             form.IntegerField('Bundle files smaller than (KB):', '0')),
+            ('adaptive_transfers',
+             form.BooleanField('Adapt transfer chunk size and concurrency:',
+                               default_value=True)),
+            ('preferred_resources',
+             form.TextField('Preferred download resources:')),
+            ('metadata_cache_ttl',
+             form.IntegerField('Metadata cache lifetime (s):', '30')),
             ('use_irods_env', form.BooleanField('Use irods environment file:',
                                                 disables_tags=tags)),
             ('host', form.HostnameField('iRODS host:', tags=tags)),
@@ -947,7 +2648,7 @@ class iRODSCatalog3(iRODSCatalogBase):
     """
 
     def __init__(self, host, port, user, zone, scrambled_password,
-                 default_resc, local_checksum):
+                 default_resc, local_checksum, **options):
         try:
             password = iRODSCatalogBase.decode(scrambled_password)
             session = iRODSSession(host=host, port=port, user=user,
@@ -957,7 +2658,7 @@ class iRODSCatalog3(iRODSCatalogBase):
             raise exceptions.ConnectionError(e)
 
         super(iRODSCatalog3, self).__init__(session, default_resc,
-                                            local_checksum)
+                                            local_checksum, **options)
 
 
 class iRODSCatalog4(iRODSCatalogBase):
@@ -966,15 +2667,15 @@ class iRODSCatalog4(iRODSCatalogBase):
     """
 
     @classmethod
-    def from_env_file(cls, env_file, local_checksum):
+    def from_env_file(cls, env_file, local_checksum, **options):
         session = iRODSSession(irods_env_file=env_file)
 
-        return cls(session, None, local_checksum)
+        return cls(session, None, local_checksum, **options)
 
     @classmethod
     def from_options(cls, host, port, user, zone, scrambled_password,
                      default_resc, local_checksum, default_hash_scheme,
-                     authentication_scheme, ssl_settings=None):
+                     authentication_scheme, ssl_settings=None, **options):
         kwargs = {}
         try:
             password = iRODSCatalogBase.decode(scrambled_password)
@@ -990,7 +2691,7 @@ class iRODSCatalog4(iRODSCatalogBase):
 
         session = iRODSSession(**kwargs)
 
-        return cls(session, default_resc, local_checksum)
+        return cls(session, default_resc, local_checksum, **options)
 
     @classmethod
     def config_fields(cls):
@@ -1048,7 +2749,7 @@ class iRODSCatalog4(iRODSCatalogBase):
         return base_dict
 
 
-def irods3_catalog_from_envfile(envfile, local_checksum):
+def irods3_catalog_from_envfile(envfile, local_checksum, **options):
     """
     Creates an iRODSCatalog from a iRODS v3 configuration file (like
     "~/.irods/.irodsEnv")
@@ -1066,7 +2767,7 @@ def irods3_catalog_from_envfile(envfile, local_checksum):
         scrambled_password = f.read().strip()
 
     return iRODSCatalog3(host, port, user, zone, scrambled_password,
-                         default_resc, local_checksum)
+                         default_resc, local_checksum, **options)
 
 
 def irods3_catalog_from_config(cfg):
@@ -1074,12 +2775,14 @@ def irods3_catalog_from_config(cfg):
     Creates an iRODSCatalog from configuration
     """
     local_checksum = option_is_true(cfg.get('local_checksum', 'True'))
+    options = transfer_options_from_config(cfg)
     use_env = option_is_true(cfg['use_irods_env'])
 
     if use_env:
         envfile = os.path.join(os.path.expanduser('~'), '.irods', '.irodsEnv')
         return lambda master: irods3_catalog_from_envfile(envfile,
-                                                          local_checksum)
+                                                          local_checksum,
+                                                          **options)
 
     host = cfg['host']
     port = cfg['port']
@@ -1097,7 +2800,7 @@ def irods3_catalog_from_config(cfg):
         scrambled_password = cfg['password']
         return lambda master: iRODSCatalog3(host, port, user, zone,
                                             scrambled_password, default_resc,
-                                            local_checksum)
+                                            local_checksum, **options)
     else:
         def ask_password(master):
             cancelled = {'cancelled': False}
@@ -1137,7 +2840,7 @@ def irods3_catalog_from_config(cfg):
             scrambled_password = iRODSCatalogBase.encode(pf.to_string())
 
             return iRODSCatalog3(host, port, user, zone, scrambled_password,
-                                 default_resc, local_checksum)
+                                 default_resc, local_checksum, **options)
 
         return ask_password
 
@@ -1147,13 +2850,15 @@ def irods4_catalog_from_config(cfg):
     Creates an iRODSCatalog from configuration
     """
     local_checksum = option_is_true(cfg.get('local_checksum', 'True'))
+    options = transfer_options_from_config(cfg)
     use_env = option_is_true(cfg['use_irods_env'])
 
     if use_env:
         envfile = os.path.join(os.path.expanduser('~'), '.irods',
                                'irods_environment.json')
         return lambda master: iRODSCatalog4.from_env_file(envfile,
-                                                          local_checksum)
+                                                          local_checksum,
+                                                          **options)
 
     host = cfg['host']
     port = cfg['port']
@@ -1194,7 +2899,7 @@ def irods4_catalog_from_config(cfg):
                                                          local_checksum,
                                                          default_hash_scheme,
                                                          authentication_scheme,
-                                                         ssl)
+                                                         ssl, **options)
     else:
         def ask_password(master):
             cancelled = {'cancelled': False}
@@ -1237,6 +2942,7 @@ def irods4_catalog_from_config(cfg):
                                               scrambled_password, default_resc,
                                               local_checksum,
                                               default_hash_scheme,
-                                              authentication_scheme, ssl)
+                                              authentication_scheme, ssl,
+                                              **options)
 
         return ask_password
@@ -4,6 +4,32 @@ from irods.models import DataObject
 import irods.exception as ex
 import irods.keywords as kw
 from irods.data_object import iRODSDataObject, irods_dirname, irods_basename
+from irods.api_number import api_number
+from irods.message import Message, StringStringMap, iRODSMessage
+from irods.message.property_types import (StringProperty, IntegerProperty,
+                                          SubmessageProperty)
+
+
+# define StructFileExtAndRegInp_PI "str objPath[MAX_NAME_LEN]; str
+# collection[MAX_NAME_LEN]; int oprType; int flags; struct KeyValPair_PI;"
+class StructFileExtAndRegRequest(Message):
+    _name = 'StructFileExtAndRegInp_PI'
+    objPath = StringProperty()
+    collection = StringProperty()
+    oprType = IntegerProperty()
+    flags = IntegerProperty()
+    KeyValPair_PI = SubmessageProperty(StringStringMap)
+
+
+# define CollOprStat_PI "int filesCnt; int totalFileCnt; double bytesWritten;
+# str lastObjPath[MAX_NAME_LEN];"
+class CollOprStat(Message):
+    _name = 'CollOprStat_PI'
+    filesCnt = IntegerProperty()
+    totalFileCnt = IntegerProperty()
+    bytesWritten = StringProperty()
+    lastObjPath = StringProperty()
+
 
 class ModifiedDataObjectManager(DataObjectManager):
     def get(self, path, file=None, **options):
@@ -27,4 +53,21 @@ class ModifiedDataObjectManager(DataObjectManager):
                 r[DataObject.resc_hier] = None
         return iRODSDataObject(self, parent, results)
 
+    def extract_bundle(self, path, collection, **options):
+        """
+        Extracts the structured file (tar) object path into collection,
+        registering its members as data objects (like 'ibun -x')
+        """
+        message_body = StructFileExtAndRegRequest(
+            objPath=path,
+            collection=collection,
+            oprType=0,
+            flags=0,
+            KeyValPair_PI=StringStringMap(options)
+        )
+        msg = iRODSMessage('RODS_API_REQ', msg=message_body,
+                           int_info=api_number['STRUCT_FILE_EXT_AND_REG_AN'])
 
+        with self.sess.pool.get_connection() as conn:
+            conn.send(msg)
+            conn.recv()
@@ -0,0 +1,87 @@
+"""
+Background retrieval of directory listings before they are displayed
+"""
+
+import collections
+import threading
+import time
+
+from six import print_
+
+
+class Prefetcher(object):
+    """
+    Retrieves directory listings in advance in a background thread, through
+    Catalog.prefetch(), so that they come from the cache when displayed.
+
+    A request replaces the pending paths of the previous ones. At most
+    MAX_PATHS paths are fetched per request, waiting INTERVAL seconds
+    between two fetches to leave the catalog to interactive queries.
+    """
+    MAX_PATHS = 20
+    INTERVAL = 0.05
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+        self.pending = collections.deque()
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+        # incremented to abandon the listing in progress
+        self.serial = 0
+
+    def request(self, paths):
+        """
+        Prefetches paths listings, cancelling pending ones
+        """
+        with self.cond:
+            if self.stopped:
+                return
+
+            self.pending = collections.deque(paths[:self.MAX_PATHS])
+            self.cond.notify()
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+
+    def cancel(self):
+        """
+        Forgets pending paths and abandons the listing in progress
+        """
+        with self.cond:
+            self.pending.clear()
+            self.serial += 1
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.pending.clear()
+            self.serial += 1
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.stopped:
+                    self.cond.wait()
+
+                if self.stopped:
+                    return
+
+                path = self.pending.popleft()
+                serial = self.serial
+
+            def cancelled():
+                return self.serial != serial
+
+            try:
+                self.catalog.prefetch(path, cancelled)
+            except Exception as e:
+                # only a lost opportunity: displaying will query again
+                print_('cannot prefetch', path, e)
+
+            time.sleep(self.INTERVAL)
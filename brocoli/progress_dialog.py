@@ -114,3 +114,91 @@ def unbounded_progress_from_generator(master, message, generator):
     with UnboundedProgressDialog(master, message) as progress:
         for _ in generator:
             progress.step(4)
+
+
+class TransfersPanel:
+    """
+    Displays the jobs of a TransferQueue in a non modal window, allowing to
+    interrupt them
+    """
+    def __init__(self, parent, transfer_queue, **kwargs):
+        self.transfer_queue = transfer_queue
+
+        self.toplevel = tk.Toplevel(parent, **kwargs)
+        self.toplevel.title('Transfers')
+        self.toplevel.protocol('WM_DELETE_WINDOW', self.hide)
+
+        self.tree = ttk.Treeview(self.toplevel, columns=['state', 'progress'],
+                                 selectmode='extended')
+        self.tree.heading('#0', text='operation', anchor='w')
+        self.tree.heading('state', text='state', anchor='w')
+        self.tree.heading('progress', text='progress', anchor='e')
+        self.tree.column('state', width=100, stretch=False)
+        self.tree.column('progress', width=80, stretch=False, anchor='e')
+
+        ysb = ttk.Scrollbar(self.toplevel, orient='vertical',
+                            command=self.tree.yview)
+        self.tree.configure(yscroll=ysb.set)
+
+        self.tree.grid(row=0, column=0, columnspan=4, sticky='nsew')
+        ysb.grid(row=0, column=4, sticky='ns')
+
+        interrupt_btn = tk.Button(self.toplevel, text='Interrupt',
+                                  command=self.interrupt)
+        interrupt_btn.grid(row=1, column=0, sticky='w')
+
+        clear_btn = tk.Button(self.toplevel, text='Clear finished',
+                              command=self.clear_finished)
+        clear_btn.grid(row=1, column=1, sticky='w')
+
+        tk.Label(self.toplevel,
+                 text='Concurrent jobs:').grid(row=1, column=2, sticky='e')
+
+        self.max_jobs = tk.IntVar()
+        self.max_jobs.set(transfer_queue.max_jobs)
+        jobs_spin = tk.Spinbox(self.toplevel, from_=1,
+                               to=transfer_queue.MAX_JOBS, width=3,
+                               textvariable=self.max_jobs,
+                               command=self.set_max_jobs)
+        jobs_spin.grid(row=1, column=3, sticky='w')
+
+        self.toplevel.rowconfigure(0, weight=1)
+        self.toplevel.columnconfigure(0, weight=1)
+
+        self.refresh()
+
+    def show(self):
+        self.toplevel.deiconify()
+        self.toplevel.lift()
+
+    def hide(self):
+        self.toplevel.withdraw()
+
+    def set_max_jobs(self):
+        self.transfer_queue.max_jobs = self.max_jobs.get()
+
+    def interrupt(self):
+        jobs = {str(id(j)): j for j in self.transfer_queue.jobs}
+
+        for iid in self.tree.selection():
+            if iid in jobs:
+                jobs[iid].interrupt()
+
+    def clear_finished(self):
+        self.transfer_queue.clear_finished()
+        self.refresh()
+
+    def refresh(self):
+        jobs = list(self.transfer_queue.jobs)
+        iids = [str(id(j)) for j in jobs]
+
+        for iid in set(self.tree.get_children()) - set(iids):
+            self.tree.delete(iid)
+
+        for iid, job in zip(iids, jobs):
+            values = [job.state, '{}%'.format(job.percent())]
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=values)
+            else:
+                self.tree.insert('', 'end', iid=iid, text=job.name,
+                                 values=values)
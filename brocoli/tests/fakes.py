@@ -0,0 +1,173 @@
+"""
+Local stand-ins for the iRODS session and data object manager
+"""
+
+import io
+import tarfile
+import threading
+
+import irods.exception
+from irods.column import Criterion
+
+from brocoli import irodscatalog
+
+
+class FakeAccount(object):
+    default_hash_scheme = 'MD5'
+
+
+class FakePool(object):
+    account = FakeAccount()
+
+
+class FakeQuery(object):
+    """
+    General query stand-in over a list of rows (dictionaries indexed by
+    columns). Results are the distinct projections on the queried columns of
+    the rows holding them and matching equality criteria.
+    """
+    def __init__(self, rows, columns, criteria=(), order=()):
+        self.rows = rows
+        self.columns = columns
+        self.criteria = criteria
+        self.order = order
+
+    def filter(self, *criteria):
+        for c in criteria:
+            if not isinstance(c, Criterion) or c.op != '=':
+                raise NotImplementedError(c)
+
+        return FakeQuery(self.rows, self.columns, self.criteria + criteria,
+                         self.order)
+
+    def order_by(self, column):
+        return FakeQuery(self.rows, self.columns, self.criteria,
+                         self.order + (column, ))
+
+    def get_results(self):
+        results = []
+        for row in self.rows:
+            if any(c not in row for c in self.columns):
+                continue
+
+            if any(row.get(c.query_key) != c.value for c in self.criteria):
+                continue
+
+            result = {c: row[c] for c in self.columns}
+            if result not in results:
+                results.append(result)
+
+        results.sort(key=lambda r: [r[c] for c in self.order])
+
+        return iter(results)
+
+    def all(self):
+        return list(self.get_results())
+
+    def one(self):
+        results = self.all()
+        if not results:
+            raise irods.exception.NoResultFound()
+        if len(results) > 1:
+            raise irods.exception.MultipleResultsFound()
+
+        return results[0]
+
+
+class FakeSession(object):
+    """
+    Session stand-in, enough to build catalogs around. Queries run over rows
+    (see FakeQuery) and are counted.
+    """
+    pool = FakePool()
+    collections = None
+    acls = None
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = 0
+
+    def query(self, *columns):
+        self.queries += 1
+        return FakeQuery(self.rows, columns)
+
+    def cleanup(self):
+        pass
+
+
+class FakeDataObject(io.BytesIO):
+    # data object handle, storing its contents when closed
+    def __init__(self, dom, path, mode):
+        self.dom = dom
+        self.path = path
+        self.mode = mode
+
+        data = b'' if mode == 'w' else dom.objects.get(path, b'')
+        super(FakeDataObject, self).__init__(data)
+
+    def close(self):
+        if not self.closed and self.mode != 'r':
+            with self.dom.lock:
+                self.dom.objects[self.path] = self.getvalue()
+
+        super(FakeDataObject, self).close()
+
+
+class FakeDataObjectManager(object):
+    """
+    In-memory data object manager, holding data objects contents by path.
+    Bundle extraction registers tar members like the server does, unless
+    refuse_bundles is True.
+    """
+    def __init__(self, refuse_bundles=False):
+        self.objects = {}
+        self.lock = threading.Lock()
+        self.refuse_bundles = refuse_bundles
+        self.extracted = []
+
+    def open(self, path, mode, **options):
+        if mode == 'r' and path not in self.objects:
+            raise irods.exception.DataObjectDoesNotExist(path)
+
+        return FakeDataObject(self, path, mode)
+
+    def unlink(self, path, force=False):
+        with self.lock:
+            del self.objects[path]
+
+    def extract_bundle(self, path, collection, **options):
+        if self.refuse_bundles:
+            raise irods.exception.SYS_NOT_SUPPORTED()
+
+        with tarfile.open(fileobj=io.BytesIO(self.objects[path])) as tar:
+            for info in tar:
+                data = tar.extractfile(info).read()
+                with self.lock:
+                    self.objects[collection + '/' + info.name] = data
+
+        self.extracted.append(path)
+
+
+class FakeCollectionManager(object):
+    # records created collections
+    def __init__(self):
+        self.created = []
+
+    def create(self, path):
+        self.created.append(path)
+
+
+def make_catalog(dom=None, session=None, **options):
+    """
+    Returns an iRODS catalog working on dom (a FakeDataObjectManager) and
+    session (a FakeSession)
+    """
+    options.setdefault('local_checksum', False)
+    local_checksum = options.pop('local_checksum')
+
+    cat = irodscatalog.iRODSCatalogBase(session or FakeSession(), None,
+                                        local_checksum, **options)
+    cat.dom = dom or FakeDataObjectManager()
+    cat.cm = FakeCollectionManager()
+
+    return cat
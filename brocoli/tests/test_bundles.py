@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from brocoli import catalog
+from brocoli import exceptions
+from brocoli.tests.fakes import FakeDataObjectManager, make_catalog
+
+
+class BundleUploadTest(unittest.TestCase):
+    """
+    Small files bundles uploads against a stand-in data object manager
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+        self.files = []
+        for i in range(5):
+            name = os.path.join(self.dir, 'file{}'.format(i))
+            with open(name, 'wb') as f:
+                f.write(os.urandom(1000 * (i + 1)))
+            self.files.append(name)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def upload(self, dom, local_checksum=False):
+        cat = make_catalog(dom, bundle_threshold=64,
+                           local_checksum=local_checksum)
+        self.assertTrue(all(cat.is_bundled(os.path.getsize(f))
+                            for f in self.files))
+
+        osl = catalog.OperationStatusList(self.files)
+        for f in self.files:
+            osl[f].size = os.path.getsize(f) * cat.cksum_factor()
+
+        targets = cat._bundle_targets((f, '/zone/coll/' + os.path.basename(f),
+                                       None) for f in self.files)
+        progress = list(cat._upload_targets(targets, osl))
+
+        return cat, osl, progress
+
+    def check_uploaded(self, dom):
+        for f in self.files:
+            with open(f, 'rb') as local:
+                self.assertEqual(dom.objects['/zone/coll/' +
+                                             os.path.basename(f)],
+                                 local.read())
+
+        # bundle objects are removed once extracted or given up
+        self.assertEqual(len(dom.objects), len(self.files))
+
+    def check_progress(self, cat, osl, progress):
+        total = sum(os.path.getsize(f) for f in self.files)
+        total *= cat.cksum_factor()
+
+        # progress never goes backwards nor exceeds the files size
+        self.assertTrue(all(y >= 0 for y in progress))
+        self.assertEqual(sum(progress), total)
+
+        for f in self.files:
+            self.assertEqual(osl[f].progress, osl[f].size)
+            self.assertEqual(osl[f].status, osl[f].DONE)
+
+    def test_extracted(self):
+        dom = FakeDataObjectManager()
+        cat, osl, progress = self.upload(dom)
+
+        self.assertEqual(len(dom.extracted), 1)
+        self.assertFalse(cat.bundles_refused)
+        self.check_uploaded(dom)
+        self.check_progress(cat, osl, progress)
+
+    def test_refused(self):
+        dom = FakeDataObjectManager(refuse_bundles=True)
+        cat, osl, progress = self.upload(dom)
+
+        # files are uploaded one by one instead
+        self.assertEqual(dom.extracted, [])
+        self.assertTrue(cat.bundles_refused)
+        self.check_uploaded(dom)
+        self.check_progress(cat, osl, progress)
+
+    def test_refused_checksum_progress(self):
+        # checksums double the files contribution to progress, and are
+        # computed again by the per-file fallback
+        dom = FakeDataObjectManager(refuse_bundles=True)
+        cat, osl, progress = self.upload(dom, local_checksum=True)
+
+        self.assertTrue(cat.bundles_refused)
+        self.check_uploaded(dom)
+        self.check_progress(cat, osl, progress)
+
+
+class ArchiveUploadTest(unittest.TestCase):
+    """
+    Archive contents uploads against a stand-in data object manager
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.archive = os.path.join(self.dir, 'a.tar')
+
+        with tarfile.open(self.archive, 'w') as tar:
+            for name in ['good1', 'd/good2', '../evil', 'good3']:
+                data = name.encode() * 100
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_rejected_member(self):
+        dom = FakeDataObjectManager()
+        cat = make_catalog(dom)
+
+        with catalog.OperationStatusList([self.archive]) as osl:
+            osl[self.archive].cancel = cat._upload_cancel
+            try:
+                list(cat.upload_archive([self.archive], '/zone/coll', osl))
+            except exceptions.CatalogLogicError as e:
+                failures = e.args[0].failures
+            else:
+                self.fail('rejected member not reported')
+
+            self.assertEqual(osl[self.archive].status,
+                             osl[self.archive].FAILED)
+
+        # the failure names the member, others are all kept
+        self.assertEqual([f for f, _ in failures], ['../evil in a.tar'])
+        self.assertEqual(sorted(dom.objects), ['/zone/coll/d/good2',
+                                               '/zone/coll/good1',
+                                               '/zone/coll/good3'])
+        self.assertEqual(dom.objects['/zone/coll/good3'], b'good3' * 100)
+        self.assertEqual(cat.cm.created, ['/zone/coll/d'])
+
+    def put(self, registered):
+        # uploads data checking it against checksum registered(data)
+        cat = make_catalog(local_checksum=True)
+        cat.registered_checksum = lambda obj: registered(cat.dom.objects[obj])
+
+        list(cat._put_stream(io.BytesIO(b'data' * 1000), '/zone/coll/x'))
+
+    def test_checksum(self):
+        self.put(lambda data: hashlib.md5(data).hexdigest())
+
+        self.assertRaises(exceptions.ChecksumError, self.put,
+                          lambda data: hashlib.md5(b'other').hexdigest())
+
+        # not comparable: another scheme is not an error
+        self.put(lambda data: 'sha2:' + base64.b64encode(
+            hashlib.sha256(b'other').digest()).decode())
+
+
+if __name__ == '__main__':
+    unittest.main()
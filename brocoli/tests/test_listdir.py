@@ -0,0 +1,190 @@
+import datetime
+import unittest
+
+import irods.exception
+from irods.models import Collection, DataObject
+
+from brocoli import exceptions
+from brocoli.catalogcache import CachedCatalog
+from brocoli.tests.fakes import FakeSession, make_catalog
+
+
+def collection(path, owner='alice'):
+    parent, _ = path.rsplit('/', 1)
+    return {
+        Collection.id: hash(path),
+        Collection.name: path,
+        Collection.parent_name: parent,
+        Collection.owner_name: owner,
+    }
+
+
+def replica(coll, name, number, size, owner='alice'):
+    row = collection(coll)
+    row.update({
+        DataObject.name: name,
+        DataObject.owner_name: owner,
+        DataObject.size: size,
+        DataObject.modify_time: datetime.datetime(2020, 1, 1),
+        DataObject.replica_number: number,
+    })
+
+    return row
+
+
+class ListdirQueriesTest(unittest.TestCase):
+    """
+    Number of catalog queries issued to list collections
+    """
+    def setUp(self):
+        self.session = FakeSession([
+            collection('/zone/home'),
+            collection('/zone/home/a'),
+            collection('/zone/home/b', owner='bob'),
+            replica('/zone/home', 'x', 0, 10),
+            replica('/zone/home', 'x', 1, 12),
+            replica('/zone/home', 'y', 0, 5),
+            replica('/zone/home/a', 'z', 0, 1),
+        ])
+        self.catalog = make_catalog(session=self.session)
+
+    def test_listdir(self):
+        self.session.queries = 0
+        listing = self.catalog.listdir('/zone/home')
+
+        # one query for sub-collections, one for data object replicas
+        self.assertEqual(self.session.queries, 2)
+
+        self.assertEqual(sorted(listing), ['a', 'b', 'x', 'y'])
+        self.assertTrue(listing['a']['isdir'])
+        self.assertEqual(listing['b']['user'], 'bob')
+        self.assertFalse(listing['x']['isdir'])
+        self.assertEqual(listing['x']['nreplicas'], 2)
+        self.assertEqual(listing['x']['size'], '10-12')
+        self.assertEqual(listing['y']['size'], '5')
+
+    def test_listdir_pages(self):
+        self.session.queries = 0
+        pages = list(self.catalog.listdir_pages('/zone/home', page_size=3))
+
+        self.assertEqual(self.session.queries, 2)
+        self.assertEqual([len(p) for p in pages], [3, 1])
+        self.assertEqual(sorted(n for p in pages for n in p),
+                         ['a', 'b', 'x', 'y'])
+
+    def test_lstat_collection(self):
+        self.session.queries = 0
+        st = self.catalog.lstat('/zone/home/a')
+
+        self.assertEqual(self.session.queries, 1)
+        self.assertTrue(st['isdir'])
+
+    def test_lstat_data_object(self):
+        st = self.catalog.lstat('/zone/home/x')
+
+        self.assertFalse(st['isdir'])
+        self.assertEqual(st['nreplicas'], 2)
+
+
+class FailingQuery(object):
+    # query failing with error when its results are retrieved
+    def __init__(self, error):
+        self.error = error
+
+    def filter(self, *criteria):
+        return self
+
+    def order_by(self, column):
+        return self
+
+    def get_results(self):
+        raise self.error
+
+
+class FailingSession(FakeSession):
+    def __init__(self, error):
+        super(FailingSession, self).__init__()
+        self.error = error
+
+    def query(self, *columns):
+        self.queries += 1
+        return FailingQuery(self.error)
+
+
+class ListdirPagesTest(unittest.TestCase):
+    """
+    Streamed listings errors and caching
+    """
+    def test_network_error(self):
+        cat = make_catalog(session=FailingSession(
+            irods.exception.NetworkException('lost')))
+
+        pages = cat.listdir_pages('/zone/home')
+        self.assertRaises(exceptions.NetworkError, next, pages)
+
+    def test_authentication_error(self):
+        session = FailingSession(
+            irods.exception.CAT_INVALID_AUTHENTICATION())
+        cat = make_catalog(session=session)
+        closed = []
+        cat.close = lambda: closed.append(True)
+
+        pages = cat.listdir_pages('/zone/home')
+        self.assertRaises(exceptions.ConnectionError, next, pages)
+        self.assertEqual(closed, [True])
+
+    def test_invalidated_while_streaming(self):
+        session = FakeSession([collection('/zone/home'),
+                               collection('/zone/home/a'),
+                               collection('/zone/home/b')])
+        cache = CachedCatalog(make_catalog(session=session))
+
+        pages = cache.listdir_pages('/zone/home', page_size=1)
+        next(pages)
+        # e.g. an upload into the directory completes meanwhile
+        cache.invalidate('/zone/home/c')
+        list(pages)
+
+        session.queries = 0
+        cache.listdir('/zone/home')
+        self.assertEqual(session.queries, 2)
+
+        # complete listings are cached otherwise
+        list(cache.listdir_pages('/zone/home'))
+        session.queries = 0
+        cache.listdir('/zone/home')
+        self.assertEqual(session.queries, 0)
+
+
+
+class PrefetchTest(unittest.TestCase):
+    """
+    Listings cached in advance
+    """
+    def setUp(self):
+        self.session = FakeSession([collection('/zone/home'),
+                                    collection('/zone/home/a'),
+                                    replica('/zone/home', 'x', 0, 10)])
+        self.cache = CachedCatalog(make_catalog(session=self.session))
+
+    def assertCached(self, cached):
+        self.session.queries = 0
+        self.cache.listdir('/zone/home')
+        self.assertEqual(self.session.queries, 0 if cached else 2)
+
+    def test_prefetch(self):
+        self.cache.prefetch('/zone/home')
+        self.assertCached(True)
+
+    def test_cancelled(self):
+        self.cache.prefetch('/zone/home', cancelled=lambda: True)
+        self.assertCached(False)
+
+    def test_too_large(self):
+        self.cache.MAX_LISTING_ENTRIES = 1
+        self.cache.prefetch('/zone/home')
+        self.assertCached(False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Background transfer jobs queue
+"""
+
+import threading
+import traceback
+
+from six import print_
+from six.moves import queue
+
+from . import catalog
+from . workerpool import WorkerPool
+
+
+class TransferJob(object):
+    """
+    A catalog operation run in the background by a TransferQueue.
+
+    operation is a callable taking an OperationStatusList over elements and
+    returning a generator of (current, total) progress pairs, like
+    Catalog.download_files() with its other arguments bound. on_done is
+    called from the user interface thread once the job is finished (see
+    TransferQueue.pop_finished()).
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    INTERRUPTED = 'interrupted'
+
+    def __init__(self, name, elements, operation, on_done=None):
+        self.name = name
+        self.elements = elements
+        self.operation = operation
+        self.on_done = on_done
+
+        self.state = self.QUEUED
+        self.current = 0
+        self.total = 0
+        self.error = None
+
+        self.interrupt_requested = False
+
+    def interrupt(self):
+        self.interrupt_requested = True
+
+    def finished(self):
+        return self.state in (self.DONE, self.FAILED, self.INTERRUPTED)
+
+    def percent(self):
+        if self.state == self.DONE:
+            return 100
+
+        if not self.total:
+            return 0
+
+        return int((100 * self.current) / self.total)
+
+    def run(self):
+        """
+        Runs the operation, yielding after each progress step
+        """
+        if self.interrupt_requested:
+            self.state = self.INTERRUPTED
+            return
+
+        self.state = self.RUNNING
+
+        with catalog.OperationStatusList(self.elements) as osl:
+            gen = self.operation(osl)
+            try:
+                for self.current, self.total in gen:
+                    yield
+
+                    if self.interrupt_requested:
+                        self.state = self.INTERRUPTED
+                        return
+            except GeneratorExit:
+                # queue is closing
+                self.state = self.INTERRUPTED
+                raise
+            finally:
+                # let the operation clean up before statuses are finalized
+                gen.close()
+
+        self.state = self.DONE
+
+
+class TransferQueue(object):
+    """
+    Runs TransferJob objects in the order they were submitted, at most
+    max_jobs at a time (up to MAX_JOBS), in worker threads
+    """
+    MAX_JOBS = 8
+
+    def __init__(self, max_jobs=2):
+        self.max_jobs = max_jobs
+
+        self.jobs = []
+        self.newly_finished = []
+        self.lock = threading.Lock()
+
+        self.pending = queue.Queue()
+        self.thread = None
+
+    def active_jobs(self):
+        return max(1, min(self.MAX_JOBS, self.max_jobs))
+
+    def submit(self, job):
+        with self.lock:
+            self.jobs.append(job)
+
+        self.pending.put(job)
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._manage)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _tasks(self):
+        while True:
+            job = self.pending.get()
+            if job is None:
+                return
+
+            yield job, job.run, ()
+
+    def _manage(self):
+        with WorkerPool(self.MAX_JOBS, self._tasks(),
+                        self.active_jobs) as pool:
+            for event, job, value in pool:
+                if event == WorkerPool.ERROR:
+                    print_(''.join(traceback.format_exception(*value)))
+
+                    if job is None:
+                        continue
+
+                    job.state = TransferJob.FAILED
+                    job.error = value[1]
+
+                if event in (WorkerPool.DONE, WorkerPool.ERROR):
+                    with self.lock:
+                        self.newly_finished.append(job)
+
+    def pop_finished(self):
+        """
+        Returns the jobs finished since the last call
+        """
+        with self.lock:
+            ret, self.newly_finished = self.newly_finished, []
+
+        return ret
+
+    def running(self):
+        with self.lock:
+            return [j for j in self.jobs if not j.finished()]
+
+    def clear_finished(self):
+        with self.lock:
+            self.jobs = [j for j in self.jobs if not j.finished()]
+
+    def close(self):
+        """
+        Interrupts all jobs and waits for them to terminate
+        """
+        for job in self.running():
+            job.interrupt()
+
+        if self.thread is None:
+            return
+
+        # end the tasks generator
+        self.pending.put(None)
+
+        self.thread.join()
+        self.thread = None
@@ -0,0 +1,265 @@
+"""
+Adaptive tuning of transfers from throughput measurements
+"""
+
+import os
+import json
+import threading
+import time
+
+from six import print_
+
+from . buffers import read_views
+
+# default tuning memory location
+default_tuning_filename = os.path.join(os.path.expanduser('~'),
+                                       '.brocoli-tuning.json')
+
+
+def load_tuning(filename):
+    """
+    Returns the tuning values remembered for every connection key
+    """
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def save_tuning(filename, key, values):
+    """
+    Updates the tuning values remembered for connection key
+    """
+    tuning = load_tuning(filename)
+    tuning.setdefault(key, {}).update(values)
+
+    try:
+        with open(filename, 'w') as f:
+            json.dump(tuning, f)
+    except (IOError, OSError) as e:
+        print_('cannot save transfer tuning', e)
+
+
+class TransferTuner(object):
+    """
+    Adjusts the chunk size and the number of concurrent workers of transfers
+    using additive increase, multiplicative decrease (AIMD).
+
+    Transfer loops read their chunks through chunks(), which measures each
+    chunk round (read and processing) latency. Every WINDOW seconds, the
+    aggregated throughput of the window is compared to the previous one:
+    chunk size and workers are increased by one step as long as throughput
+    does not drop, and both are halved otherwise. A chunk slower than
+    MAX_LATENCY halves the chunk size alone, to keep transfers interruptible.
+
+    Tuned values are remembered per connection key in a JSON file and used
+    as starting values by the next session. A disabled tuner always returns
+    its initial values.
+    """
+    MIN_CHUNK_SIZE = 256 * 1024
+    MAX_CHUNK_SIZE = 64 * 1024 * 1024
+    CHUNK_STEP = 1024 * 1024
+
+    DECREASE = 0.5
+    TOLERANCE = 0.05
+
+    WINDOW = 2.0
+    MAX_LATENCY = 2.0
+
+    def __init__(self, key, chunk_size, max_workers, enabled=True,
+                 filename=None):
+        self.key = key
+        self.enabled = enabled
+        self.filename = filename or default_tuning_filename
+
+        self.max_workers = max(1, max_workers)
+
+        self.chunk_size = chunk_size
+        self.workers = self.max_workers
+
+        if self.enabled:
+            saved = load_tuning(self.filename).get(self.key, {})
+            self.chunk_size = self._clamp_chunk(saved.get('chunk_size',
+                                                          chunk_size))
+            self.workers = self._clamp_workers(saved.get('workers',
+                                                         self.max_workers))
+
+        self.lock = threading.Lock()
+
+        self.window_start = None
+        self.window_end = None
+        self.window_bytes = 0
+        self.window_latency = 0
+        self.throughput = None
+
+    def _clamp_chunk(self, size):
+        return int(min(self.MAX_CHUNK_SIZE, max(self.MIN_CHUNK_SIZE, size)))
+
+    def _clamp_workers(self, n):
+        return int(min(self.max_workers, max(1, n)))
+
+    def save(self):
+        """
+        Remembers current values for the connection key
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            save_tuning(self.filename, self.key, {
+                'chunk_size': self.chunk_size,
+                'workers': self.workers,
+            })
+
+    def active_workers(self):
+        """
+        Returns how many workers may run transfers concurrently
+        """
+        return self.workers
+
+    def chunks(self, f, length=None):
+        """
+        Reads file-like f (up to length bytes) by chunks of the current chunk
+        size (see buffers.read_views()), recording the time spent between two
+        chunks
+        """
+        start = time.time()
+
+        for chunk in read_views(f, lambda: self.chunk_size, length):
+            n = len(chunk)
+            yield chunk
+
+            now = time.time()
+            self.record(n, now - start)
+            start = now
+
+    def record(self, nbytes, seconds):
+        """
+        Accounts for a chunk of nbytes transferred in seconds
+        """
+        if not self.enabled:
+            return
+
+        with self.lock:
+            now = time.time()
+
+            if self.window_end is not None and \
+                    now - seconds - self.window_end > self.WINDOW:
+                # transfers were idle: do not measure the gap
+                self.window_start = None
+
+            if self.window_start is None:
+                self.window_start = now - seconds
+                self.window_bytes = 0
+                self.window_latency = 0
+
+            self.window_end = now
+            self.window_bytes += nbytes
+            self.window_latency = max(self.window_latency, seconds)
+
+            elapsed = now - self.window_start
+            if elapsed >= self.WINDOW:
+                self._adjust(self.window_bytes / elapsed, self.window_latency)
+                self.window_start = None
+
+    def _adjust(self, throughput, latency):
+        if latency > self.MAX_LATENCY:
+            self.chunk_size = self._clamp_chunk(self.chunk_size *
+                                                self.DECREASE)
+        elif (self.throughput is None or
+              throughput >= self.throughput * (1 - self.TOLERANCE)):
+            self.chunk_size = self._clamp_chunk(self.chunk_size +
+                                                self.CHUNK_STEP)
+            self.workers = self._clamp_workers(self.workers + 1)
+        else:
+            self.chunk_size = self._clamp_chunk(self.chunk_size *
+                                                self.DECREASE)
+            self.workers = self._clamp_workers(self.workers * self.DECREASE)
+
+        self.throughput = throughput
+
+
+class ResourceRanking(object):
+    """
+    Ranks storage resources to read replicas from.
+
+    Configured preferred resources come first, in their order. Other
+    resources are ranked by the throughput measured when reading from them,
+    averaged over past transfers (exponential moving average). Resources
+    never measured are ranked before measured ones until they have been read
+    from MAX_TRIES times, and after them afterwards.
+
+    Measured throughputs are remembered per connection key along with
+    TransferTuner values.
+    """
+    # weight of the last measure in throughput averages
+    ALPHA = 0.3
+
+    # smaller transfers measure latency rather than throughput: their
+    # weight in averages is reduced in proportion
+    MIN_SAMPLE_SIZE = 1024 * 1024
+
+    # reads from an unmeasured resource before it is ranked last
+    MAX_TRIES = 3
+
+    def __init__(self, key, preferred=(), filename=None):
+        self.key = key
+        self.preferred = list(preferred)
+        self.filename = filename or default_tuning_filename
+
+        saved = load_tuning(self.filename).get(self.key, {})
+        self.throughputs = dict(saved.get('resources', {}))
+
+        # reads recorded per resource during this session
+        self.tries = {}
+
+        self.lock = threading.Lock()
+
+    def rank(self, resource_name):
+        """
+        Returns a sort key of resource_name (lower is better)
+        """
+        if resource_name in self.preferred:
+            return 0, self.preferred.index(resource_name)
+
+        throughput = self.throughputs.get(resource_name)
+        if throughput is None:
+            if self.tries.get(resource_name, 0) < self.MAX_TRIES:
+                return 1, 0
+
+            return 3, 0
+
+        return 2, -throughput
+
+    def best(self, replicas):
+        """
+        Returns the best ranked of replicas (see irodscatalog replicas info)
+        """
+        with self.lock:
+            return min(replicas, key=lambda r: self.rank(r['resource_name']))
+
+    def record(self, resource_name, nbytes, seconds):
+        """
+        Accounts for nbytes read from resource_name in seconds
+        """
+        with self.lock:
+            self.tries[resource_name] = self.tries.get(resource_name, 0) + 1
+
+            if nbytes <= 0 or seconds <= 0:
+                return
+
+            throughput = nbytes / seconds
+
+            average = self.throughputs.get(resource_name)
+            if average is not None:
+                alpha = self.ALPHA * min(1.0, nbytes /
+                                         float(self.MIN_SAMPLE_SIZE))
+                throughput = alpha * throughput + (1 - alpha) * average
+
+            self.throughputs[resource_name] = throughput
+
+    def save(self):
+        with self.lock:
+            save_tuning(self.filename, self.key,
+                        {'resources': self.throughputs})
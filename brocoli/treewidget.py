@@ -1,11 +1,14 @@
 from . import catalog
-from . progress_dialog import ProgressDialog
-from . progress_dialog import progress_from_generator as progress
+from . progress_dialog import ProgressDialog, TransfersPanel
 from . progress_dialog import unbounded_progress_from_generator as uprogress
-from . exceptions import handle_catalog_exceptions
+from . exceptions import handle_catalog_exceptions, report_catalog_exception
+from . transferqueue import TransferJob, TransferQueue
 from . import exceptions
+from . import archives
 from . import navbar
 from . listmanager import ColumnDef
+from . virtualrows import VirtualRows
+from . prefetcher import Prefetcher
 
 import six
 from six import print_
@@ -17,6 +20,7 @@ from six.moves import tkinter_ttk as ttk
 from six.moves import tkinter_messagebox as messagebox
 
 import collections
+import functools
 import re
 
 
@@ -27,19 +31,27 @@ class TreeWidget(tk.Frame):
     """
     __placeholder_prefix = '__placeholder_'
     __empty_prefix = '__empty_'
+    __loading_prefix = '__loading_'
     __dot_prefix = 'dot_'
     __dotdot_prefix = 'dotdot_'
 
     __prefix_path_re = re.compile('^(?P<prefix>{})(?P<suffix>.*)$'.format('|'.join([
         __placeholder_prefix,
         __empty_prefix,
+        __loading_prefix,
         __dot_prefix,
         __dotdot_prefix,
     ])))
     __context_menu_upload = 'Upload local files'
     __context_menu_upload_directory = 'Recursive upload'
+    __context_menu_upload_archive = 'Upload archive contents'
+    __context_menu_sync_upload = 'Synchronize from local directory'
     __context_menu_download = 'Download to local disk'
+    __context_menu_sync = 'Synchronize to local disk'
+    __context_menu_archive = 'Download as archive'
     __context_menu_delete = 'Delete'
+    __context_menu_copy = 'Copy to'
+    __context_menu_move = 'Move to'
     __context_menu_mkdir = 'New directory'
     __context_menu_goto = 'Go to'
     __context_menu_properties = 'Properties'
@@ -52,6 +64,21 @@ class TreeWidget(tk.Frame):
         ('mtime', ColumnDef('mtime', 'modification time')),
     ])
 
+    # transfer jobs polling period (ms)
+    TRANSFERS_POLL = 250
+
+    # directory entries inserted at once when listing large directories
+    LISTING_PAGE_SIZE = 1000
+
+    # displayed directories with more entries only materialize visible rows
+    VIRTUAL_THRESHOLD = 10000
+
+    # rows scrolled by a mouse wheel step
+    WHEEL_ROWS = 3
+
+    # delay before prefetching listings of visible sub-directories (ms)
+    PREFETCH_DELAY = 300
+
     def __init__(self, master):
         tk.Frame.__init__(self, master)
 
@@ -76,9 +103,10 @@ class TreeWidget(tk.Frame):
 
         self.tree = ttk.Treeview(self, columns=self.columns)
 
-        ysb = ttk.Scrollbar(self, orient='vertical', command=self.tree.yview)
+        self.ysb = ttk.Scrollbar(self, orient='vertical',
+                                 command=self.tree.yview)
         xsb = ttk.Scrollbar(self, orient='horizontal', command=self.tree.xview)
-        self.tree.configure(yscroll=ysb.set, xscroll=xsb.set)
+        self.tree.configure(yscroll=self._yscroll, xscroll=xsb.set)
 
         for c in ['#0'] + self.columns:
             cd = self.columns_def[c]
@@ -87,7 +115,7 @@ class TreeWidget(tk.Frame):
         self.tree.bind('<<TreeviewOpen>>', self.open_cb)
 
         self.tree.grid(row=1, column=0, sticky='nsew')
-        ysb.grid(row=1, column=1, sticky='ns')
+        self.ysb.grid(row=1, column=1, sticky='ns')
         xsb.grid(row=2, column=0, sticky='ew')
 
         self.rowconfigure(1, weight=1)
@@ -95,6 +123,104 @@ class TreeWidget(tk.Frame):
 
         self._set_context_menu()
 
+        # directory listings in progress, indexed by parent item
+        self.listings = {}
+
+        # rows of the displayed directory, and whether only the visible ones
+        # are materialized
+        self.rows = VirtualRows()
+        self.virtual = False
+        self._bind_virtual_events()
+
+        # listings of visible sub-directories are retrieved in advance
+        self.prefetcher = None
+        self.prefetch_job = None
+
+        # transfers run in the background
+        self.transfer_queue = TransferQueue()
+        self.transfers_panel = None
+        self.after(self.TRANSFERS_POLL, self._poll_transfers)
+
+    def show_transfers(self):
+        if self.transfers_panel is None:
+            self.transfers_panel = TransfersPanel(self.master,
+                                                  self.transfer_queue)
+
+        self.transfers_panel.show()
+
+    def _poll_transfers(self):
+        for job in self.transfer_queue.pop_finished():
+            if job.on_done is not None:
+                job.on_done()
+
+            if job.error is not None:
+                report_catalog_exception(job.error)
+
+        if self.transfers_panel is not None:
+            self.transfers_panel.refresh()
+
+        self.after(self.TRANSFERS_POLL, self._poll_transfers)
+
+    def _queue_transfer(self, name, elements, operation, on_done=None):
+        """
+        Runs operation (see TransferJob) in the background
+        """
+        self.transfer_queue.submit(TransferJob(name, elements, operation,
+                                               on_done))
+
+        self.show_transfers()
+
+    def stop_transfers(self):
+        """
+        Interrupts running transfers and waits for them to terminate
+        """
+        self.transfer_queue.close()
+
+    def stop_prefetch(self):
+        if self.prefetch_job is not None:
+            self.after_cancel(self.prefetch_job)
+            self.prefetch_job = None
+
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetcher = None
+
+    def _schedule_prefetch(self):
+        # prefetch once the display settles
+        if self.prefetch_job is not None:
+            self.after_cancel(self.prefetch_job)
+
+        self.prefetch_job = self.after(self.PREFETCH_DELAY,
+                                       self._prefetch_visible)
+
+    def _prefetch_visible(self):
+        """
+        Prefetches the listings of displayed directories that were not
+        expanded yet, in display order
+        """
+        self.prefetch_job = None
+        if self.prefetcher is None:
+            return
+
+        paths = []
+        items = list(self.tree.get_children(''))
+        while items:
+            item = items.pop(0)
+            children = self.tree.get_children(item)
+
+            if self.tree.item(item, option='open'):
+                items[:0] = children
+            elif (len(children) == 1 and
+                    children[0].startswith(self.__placeholder_prefix) and
+                    self.tree.bbox(item)):
+                paths.append(self.item_path(item))
+
+        self.prefetcher.request(paths)
+
+    def _yscroll(self, first, last):
+        self.ysb.set(first, last)
+        self._schedule_prefetch()
+
     def get_display_columns(self):
         return self.tree.config(cnf='displaycolumns')[-1]
 
@@ -139,8 +265,18 @@ class TreeWidget(tk.Frame):
 
             return False
 
+        if self.transfer_queue.running():
+            if not messagebox.askokcancel('Switch connection',
+                                          'Interrupt running transfers?'):
+                catalog.close()
+                return False
+
+        self.stop_transfers()
+        self.stop_prefetch()
+
         self.catalog = catalog
         self.root_path = path
+        self.prefetcher = Prefetcher(catalog)
 
         self.set_path(path, clear_history=True)
 
@@ -181,7 +317,7 @@ class TreeWidget(tk.Frame):
 
         self.navigation_bar.set_path(self.path, clear_history)
 
-        self.refresh()
+        self.reload()
 
         return True, self.path
 
@@ -189,8 +325,24 @@ class TreeWidget(tk.Frame):
         if self.catalog is None:
             return
 
+        # displayed contents are requested again from the catalog
+        self.catalog.invalidate(self.path, recursive=True)
+
+        self.reload()
+
+    def reload(self):
+        """
+        Displays the current path contents (possibly from the catalog cache)
+        """
+        if self.catalog is None:
+            return
+
         print_('refresh', self.path)
 
+        # listings prefetched for the previous display are not needed now
+        if self.prefetcher is not None:
+            self.prefetcher.cancel()
+
         for child in self.tree.get_children():
             self.tree.delete(child)
 
@@ -221,11 +373,24 @@ class TreeWidget(tk.Frame):
                                       command=self.mkdir)
         self.context_menu.add_command(label=self.__context_menu_download,
                                       command=self.download)
+        self.context_menu.add_command(label=self.__context_menu_sync,
+                                      command=self.sync)
+        self.context_menu.add_command(label=self.__context_menu_archive,
+                                      command=self.download_archive)
         self.context_menu.add_command(label=self.__context_menu_upload,
                                       command=self.upload)
         self.context_menu.add_command(label=self.
                                       __context_menu_upload_directory,
                                       command=self.upload_directory)
+        self.context_menu.add_command(label=self.
+                                      __context_menu_upload_archive,
+                                      command=self.upload_archive)
+        self.context_menu.add_command(label=self.__context_menu_sync_upload,
+                                      command=self.sync_upload_directory)
+        self.context_menu.add_command(label=self.__context_menu_copy,
+                                      command=self.copy)
+        self.context_menu.add_command(label=self.__context_menu_move,
+                                      command=self.move)
         self.context_menu.add_command(label=self.__context_menu_delete,
                                       command=self.delete)
 
@@ -246,7 +411,14 @@ class TreeWidget(tk.Frame):
     def get_selection(self):
         ret = []
 
-        for e in self.tree.selection():
+        selection = self.tree.selection()
+        if self.virtual:
+            self._sync_virtual_selection()
+            index = self.rows.index
+            selection = sorted((i for i in self.rows.selected if i in index),
+                               key=index.get)
+
+        for e in selection:
             if e.startswith('__'):
                 continue
             ret.append(e)
@@ -264,6 +436,9 @@ class TreeWidget(tk.Frame):
                 self.context_menu.unpost()
                 return
         else:
+            # rows selected out of the viewport are deselected too
+            self.rows.selected.clear()
+
             if selection and self.context_menu_mapped:
                 self.context_menu.unpost()
                 self.tree.selection_set(item)
@@ -275,7 +450,7 @@ class TreeWidget(tk.Frame):
         is_directory = False
         if len(selection) == 1:
             item = selection[0]
-            is_directory = (len(self.tree.get_children(item)) >= 1 or
+            is_directory = (self._is_directory(item) or
                             item.startswith(self.__dot_prefix) or
                             item.startswith(self.__dotdot_prefix))
 
@@ -285,6 +460,10 @@ class TreeWidget(tk.Frame):
         self.context_menu.entryconfig(self.__context_menu_upload, state=state)
         self.context_menu.entryconfig(self.__context_menu_upload_directory,
                                       state=state)
+        self.context_menu.entryconfig(self.__context_menu_upload_archive,
+                                      state=state)
+        self.context_menu.entryconfig(self.__context_menu_sync_upload,
+                                      state=state)
         self.context_menu.entryconfig(self.__context_menu_mkdir, state=state)
 
         self.context_menu.entryconfig(self.__context_menu_goto, state=state)
@@ -297,11 +476,21 @@ class TreeWidget(tk.Frame):
         self.context_menu.entryconfig(self.__context_menu_download,
                                       state=state)
 
+        state = tk.DISABLED
+        if any(self._is_directory(s) for s in selection):
+            state = tk.ACTIVE
+
+        self.context_menu.entryconfig(self.__context_menu_sync, state=state)
+        self.context_menu.entryconfig(self.__context_menu_archive,
+                                      state=state)
+
         state = tk.ACTIVE
         if (item.startswith(self.__dot_prefix) or
                 item.startswith(self.__dotdot_prefix)):
             state = tk.DISABLED
 
+        self.context_menu.entryconfig(self.__context_menu_copy, state=state)
+        self.context_menu.entryconfig(self.__context_menu_move, state=state)
         self.context_menu.entryconfig(self.__context_menu_delete,
                                       state=state)
 
@@ -321,12 +510,26 @@ class TreeWidget(tk.Frame):
 
         self.set_path(self.catalog.dirname(self.path))
 
+    def _refresh_directory(self, path):
+        # refresh path contents if still displayed
+        if path == self.path:
+            self.process_directory('', path)
+        elif self.tree.exists(path):
+            self.process_directory(path, path)
+
+    def _is_directory(self, item):
+        if self.tree.exists(item):
+            return len(self.tree.get_children(item)) > 0
+
+        # selected row out of the virtual window
+        return self.rows.is_directory(item)
+
     def _split_files_and_directories(self, selection):
         files = []
         directories = []
         for s in selection:
             s = self.item_path(s)
-            if len(self.tree.get_children(s)) > 0:
+            if self._is_directory(s):
                 directories.append(s)
             else:
                 files.append(s)
@@ -345,15 +548,72 @@ class TreeWidget(tk.Frame):
         files, directories = self._split_files_and_directories(selection)
 
         if files:
-            with catalog.OperationStatusList(files) as osl:
-                progress(self.master, 'download {} files'.format(len(files)),
-                         self.catalog.download_files(files, destdir, osl))
+            self._queue_transfer('download {} files'.format(len(files)),
+                                 files,
+                                 functools.partial(self.catalog.download_files,
+                                                   files, destdir))
 
         if directories:
-            with catalog.OperationStatusList(directories) as osl:
-                progress(self.master,
-                         'download {} directories'.format(len(directories)),
-                         self.catalog.download_directories(directories, destdir, osl))
+            self._queue_transfer('download {} directories'.format(
+                                     len(directories)),
+                                 directories,
+                                 functools.partial(
+                                     self.catalog.download_directories,
+                                     directories, destdir))
+
+    @handle_catalog_exceptions
+    def sync(self):
+        selection = self.get_selection()
+        _, directories = self._split_files_and_directories(selection)
+        if not directories:
+            return
+
+        destdir = filedialog.askdirectory()
+        if not destdir:
+            return
+
+        delete_extra = messagebox.askyesnocancel('Synchronize',
+                                                 'Delete local files absent '
+                                                 'from the catalog?')
+        if delete_extra is None:
+            return
+
+        print_('synchronizing', directories, 'to', destdir)
+
+        self._queue_transfer('synchronize {} directories'.format(
+                                 len(directories)),
+                             directories,
+                             functools.partial(self.catalog.sync_directories,
+                                               directories, destdir,
+                                               delete_extra=delete_extra))
+
+    @handle_catalog_exceptions
+    def download_archive(self):
+        selection = self.get_selection()
+        _, directories = self._split_files_and_directories(selection)
+        if not directories:
+            return
+
+        filetypes = [('tar archive', '.tar'),
+                     ('compressed tar archive', '.tar.gz'),
+                     ('zip archive', '.zip')]
+        archive = filedialog.asksaveasfilename(filetypes=filetypes,
+                                               defaultextension='.tar.gz')
+        if not archive:
+            return
+
+        if archives.archive_format(archive) is None:
+            messagebox.showerror('Download as archive',
+                                 'Unsupported archive format: ' + archive)
+            return
+
+        print_('archiving', directories, 'to', archive)
+
+        self._queue_transfer('archive {} directories'.format(
+                                 len(directories)),
+                             directories,
+                             functools.partial(self.catalog.download_archive,
+                                               directories, archive))
 
     @handle_catalog_exceptions
     def upload(self):
@@ -363,15 +623,10 @@ class TreeWidget(tk.Frame):
             return
 
         print_('uploading', files, 'to', path)
-        if files:
-            with catalog.OperationStatusList(files) as osl:
-                progress(self.master, 'upload {} files'.format(len(files)),
-                         self.catalog.upload_files(files, path, osl))
-
-        pathid = path
-        if path == self.path:
-            pathid = ''
-        self.process_directory(pathid, path)
+        self._queue_transfer('upload {} files'.format(len(files)), files,
+                             functools.partial(self.catalog.upload_files,
+                                               files, path),
+                             lambda: self._refresh_directory(path))
 
     @handle_catalog_exceptions
     def upload_directory(self):
@@ -382,14 +637,98 @@ class TreeWidget(tk.Frame):
 
         print_('recursively uploading', directory, 'to', path)
 
-        with catalog.OperationStatusList([directory]) as osl:
-            progress(self.master, 'recursively upload {} directory'.format(1),
-                     self.catalog.upload_directories((directory, ), path, osl))
+        self._queue_transfer('recursively upload {}'.format(directory),
+                             [directory],
+                             functools.partial(self.catalog.upload_directories,
+                                               (directory, ), path),
+                             lambda: self._refresh_directory(path))
 
-        pathid = path
-        if path == self.path:
-            pathid = ''
-        self.process_directory(pathid, path)
+    @handle_catalog_exceptions
+    def upload_archive(self):
+        path = self.item_path(self.get_selection()[0])
+        filetypes = [('archives', ('.tar', '.tar.gz', '.tgz', '.tar.bz2',
+                                   '.tar.xz', '.zip')),
+                     ('all files', '*')]
+        files = filedialog.askopenfilenames(filetypes=filetypes)
+        if not files:
+            return
+
+        print_('uploading contents of', files, 'to', path)
+        self._queue_transfer('upload contents of {} archives'.format(
+                                 len(files)),
+                             files,
+                             functools.partial(self.catalog.upload_archive,
+                                               files, path),
+                             lambda: self._refresh_directory(path))
+
+    @handle_catalog_exceptions
+    def sync_upload_directory(self):
+        path = self.item_path(self.get_selection()[0])
+        directory = filedialog.askdirectory()
+        if not directory:
+            return
+
+        print_('synchronizing', directory, 'to', path)
+
+        self._queue_transfer('synchronize from {}'.format(directory),
+                             [directory],
+                             functools.partial(
+                                 self.catalog.sync_upload_directories,
+                                 (directory, ), path),
+                             lambda: self._refresh_directory(path))
+
+    def _copy_or_move(self, verb, copy_or_move_files,
+                      copy_or_move_directories):
+        selection = self.get_selection()
+        files, directories = self._split_files_and_directories(selection)
+
+        destdir = simpledialog.askstring(verb.capitalize(),
+                                         '{} to catalog directory'.format(
+                                             verb.capitalize()),
+                                         initialvalue=self.path)
+        if not destdir:
+            return
+
+        destdir = self.catalog.normpath(destdir)
+        if not self.catalog.isdir(destdir):
+            messagebox.showerror(verb.capitalize(),
+                                 '{} is not a directory'.format(destdir))
+            return
+
+        print_(verb, selection, 'to', destdir)
+
+        # source and destination directories change
+        parents = {self.catalog.dirname(p) for p in files + directories}
+        parents.add(destdir)
+
+        def _refresh():
+            for p in parents:
+                self._refresh_directory(p)
+
+        if files:
+            self._queue_transfer('{} {} files'.format(verb, len(files)),
+                                 files,
+                                 functools.partial(copy_or_move_files,
+                                                   files, destdir),
+                                 _refresh)
+
+        if directories:
+            self._queue_transfer('{} {} directories'.format(
+                                     verb, len(directories)),
+                                 directories,
+                                 functools.partial(copy_or_move_directories,
+                                                   directories, destdir),
+                                 _refresh)
+
+    @handle_catalog_exceptions
+    def copy(self):
+        self._copy_or_move('copy', self.catalog.copy_files,
+                           self.catalog.copy_directories)
+
+    @handle_catalog_exceptions
+    def move(self):
+        self._copy_or_move('move', self.catalog.move_files,
+                           self.catalog.move_directories)
 
     @handle_catalog_exceptions
     def delete(self):
@@ -410,7 +749,9 @@ class TreeWidget(tk.Frame):
             if not messagebox.askokcancel('Confirm Delete', msg):
                 return
 
-        parents = {self.tree.parent(f) for f in selection}
+        # rows out of the virtual window are not materialized
+        parents = {self.tree.parent(f) if self.tree.exists(f) else ''
+                   for f in selection}
 
         with ProgressDialog(self.master, '') as progress_bar, \
                 catalog.OperationStatusList(files + directories) as osl:
@@ -456,6 +797,14 @@ class TreeWidget(tk.Frame):
         new_dir = self.catalog.join(parent, name)
         self.catalog.mkdir(new_dir)
 
+        if self.virtual:
+            if selected.startswith(TreeWidget.__dot_prefix):
+                # new directory row takes its place among the others
+                self.process_directory('', parent)
+
+            # virtual rows are not expanded
+            return
+
         if selected.startswith(TreeWidget.__dot_prefix):
             selected = ''
         elif not self.tree.item(selected, option='open'):
@@ -482,7 +831,7 @@ class TreeWidget(tk.Frame):
 
         props = None
         entry_type = ''
-        if len(self.tree.get_children(selected)) > 0 or selected != path:
+        if self._is_directory(selected) or selected != path:
             # directories have children or have their iid different from
             # their path
             props = self.catalog.directory_properties(path)
@@ -508,6 +857,13 @@ class TreeWidget(tk.Frame):
 
     def open_cb(self, event):
         iid = self.tree.focus()
+
+        if self.virtual and self.tree.parent(iid) == '':
+            # expanding rows would break the virtual window: go to instead
+            self.tree.item(iid, open=False)
+            self.set_path(self.item_path(iid))
+            return
+
         children = self.tree.get_children(iid)
         if len(children) == 1 and \
            children[0].startswith(self.__placeholder_prefix):
@@ -515,6 +871,9 @@ class TreeWidget(tk.Frame):
 
     def __fill_item(self, parent, path, name, st):
         abspath = self.catalog.join(path, name)
+        if self.tree.exists(abspath):
+            # already inserted while listing
+            return
 
         values = [st[k] for k in self.columns]
         oid = self.tree.insert(parent, 'end', iid=abspath, text=name,
@@ -525,26 +884,243 @@ class TreeWidget(tk.Frame):
                              iid=self.__placeholder_prefix + abspath)
 
     def process_directory(self, parent, path):
+        """
+        Lists path contents under the parent item. Entries are inserted page
+        by page, the following pages being retrieved when the user interface
+        is idle.
+        """
+        # stop listing in progress for the same item
+        self.listings.pop(parent, None)
+
+        pages = self.catalog.listdir_pages(path, self.LISTING_PAGE_SIZE)
 
-        entries = self.catalog.listdir(path)
+        # first page comes synchronously so that errors reach the caller
+        entries = next(pages, None)
 
         item_children = self.tree.get_children(parent)
         for child in item_children:
             self.tree.delete(child)
 
         if parent == '':
+            self._set_virtual(False)
+            self.rows.clear()
+
             if path != self.root_path:
                 ppath = self.catalog.dirname(path)
                 self.tree.insert(parent, 'end',
                                  iid=self.__dotdot_prefix + ppath,
                                  text='..')
+                self.rows.append(self.__dotdot_prefix + ppath, '..')
             self.tree.insert(parent, 'end', iid=self.__dot_prefix + path,
                              text='.')
+            self.rows.append(self.__dot_prefix + path, '.')
 
         if not entries:
             self.tree.insert(parent, 'end', iid=self.__empty_prefix + path,
                              text='<empty dir>')
             return
 
-        for k, v in entries.items():
-            self.__fill_item(parent, path, k, v)
+        self.listings[parent] = pages
+        self.tree.insert(parent, 'end', iid=self.__loading_prefix + path,
+                         text='<loading...>')
+        if parent == '':
+            self.rows.loading = True
+        self._insert_page(parent, path, entries)
+
+    def _insert_page(self, parent, path, entries):
+        if parent == '':
+            for k, v in entries.items():
+                self.rows.append(self.catalog.join(path, k), k,
+                                 [v[c] for c in self.columns], v['isdir'])
+
+            if not self.virtual and len(self.rows) > self.VIRTUAL_THRESHOLD:
+                self._set_virtual(True)
+
+        if parent == '' and self.virtual:
+            self._render_virtual()
+        else:
+            for k, v in entries.items():
+                self.__fill_item(parent, path, k, v)
+
+            # keep the loading item last
+            self.tree.move(self.__loading_prefix + path, parent, 'end')
+
+        self._schedule_prefetch()
+
+        self.after_idle(self._continue_listing, parent, path,
+                        self.listings[parent])
+
+    @handle_catalog_exceptions
+    def _continue_listing(self, parent, path, pages):
+        if self.listings.get(parent) is not pages:
+            # directory was listed again
+            return
+
+        if parent != '' and not self.tree.exists(parent):
+            # directory is not displayed anymore
+            del self.listings[parent]
+            return
+
+        entries = None
+        try:
+            entries = next(pages, None)
+        finally:
+            if entries is None:
+                del self.listings[parent]
+                if self.tree.exists(self.__loading_prefix + path):
+                    self.tree.delete(self.__loading_prefix + path)
+
+                if parent == '':
+                    self.rows.loading = False
+
+        if entries is None:
+            return
+
+        self._insert_page(parent, path, entries)
+
+    def _bind_virtual_events(self):
+        def _wheel(e):
+            if not self.virtual:
+                return
+
+            step = -self.WHEEL_ROWS
+            if e.num == 5 or getattr(e, 'delta', 0) < 0:
+                step = self.WHEEL_ROWS
+            self._scroll_virtual(self.rows.top + step)
+
+            return 'break'
+
+        def _click(e):
+            # plain clicks deselect rows out of the viewport
+            if self.virtual and not e.state & 0x0005:
+                self.rows.selected.clear()
+
+        def _key(e):
+            # keep the focused row in the viewport, the default key bindings
+            # then moving the focus
+            if not self.virtual:
+                return
+
+            window = self.rows.window()
+            focus = self.tree.focus()
+            if e.keysym == 'Down' and window and focus == window[-1]:
+                self._scroll_virtual(self.rows.top + 1)
+            elif e.keysym == 'Up' and window and focus == window[0]:
+                self._scroll_virtual(self.rows.top - 1)
+            elif e.keysym in ('Next', 'Prior'):
+                step = self.rows.size
+                if e.keysym == 'Prior':
+                    step = -step
+                self._scroll_virtual(self.rows.top + step)
+
+                return 'break'
+
+        for sequence in ['<MouseWheel>', '<Button-4>', '<Button-5>']:
+            self.tree.bind(sequence, _wheel, add='+')
+        self.tree.bind('<Button-1>', _click, add='+')
+        for sequence in ['<Up>', '<Down>', '<Next>', '<Prior>']:
+            self.tree.bind(sequence, _key, add='+')
+        self.tree.bind('<Configure>',
+                       lambda e: self.virtual and self._render_virtual(),
+                       add='+')
+
+    def _set_virtual(self, virtual):
+        """
+        Switches between materializing every row of the displayed directory
+        and only the visible ones
+        """
+        if virtual == self.virtual:
+            return
+
+        self.virtual = virtual
+        if virtual:
+            print_('virtual display of', len(self.rows), 'rows')
+
+            self.rows.selected = set(self.tree.selection())
+            for child in self.tree.get_children(''):
+                if not child.startswith(self.__loading_prefix):
+                    self.tree.delete(child)
+
+            # scrollbar follows the rows model instead of the tree
+            self.tree.configure(yscroll=lambda *args: None)
+            self.ysb.configure(command=self._yview_virtual)
+
+            self._render_virtual()
+        else:
+            self.tree.configure(yscroll=self._yscroll)
+            self.ysb.configure(command=self.tree.yview)
+
+    def _visible_rows(self):
+        children = self.tree.get_children('')
+        bbox = self.tree.bbox(children[0]) if children else None
+        if not bbox or self.tree.winfo_height() <= 1:
+            return int(self.tree.cget('height'))
+
+        # rows fitting below the first one
+        return max(1, (self.tree.winfo_height() - bbox[1]) // bbox[3])
+
+    def _sync_virtual_selection(self):
+        selection = set(self.tree.selection())
+        for iid in self.tree.get_children(''):
+            if iid in selection:
+                self.rows.selected.add(iid)
+            else:
+                self.rows.selected.discard(iid)
+
+    def _render_virtual(self):
+        """
+        Materializes the rows of the window, recycling the ones already
+        materialized
+        """
+        self._sync_virtual_selection()
+
+        rows = self.rows
+        rows.size = self._visible_rows()
+        rows.scroll_to(rows.top)
+
+        window = rows.window()
+        wanted = set(window)
+
+        loading = None
+        gone = []
+        for iid in self.tree.get_children(''):
+            if iid.startswith(self.__loading_prefix):
+                loading = iid
+            elif iid not in wanted:
+                gone.append(iid)
+        if gone:
+            self.tree.delete(*gone)
+
+        for pos, iid in enumerate(window):
+            if self.tree.exists(iid):
+                continue
+
+            _, text, values, isdir = rows.row(rows.top + pos)
+            self.tree.insert('', pos, iid=iid, text=text, open=False,
+                             values=values)
+            if isdir:
+                self.tree.insert(iid, 'end',
+                                 iid=self.__placeholder_prefix + iid)
+
+        if loading is not None:
+            self.tree.move(loading, '', 'end')
+
+        self.tree.selection_set([i for i in window if i in rows.selected])
+        self.tree.yview_moveto(0)
+        self.ysb.set(*rows.fractions())
+
+        self._schedule_prefetch()
+
+    def _scroll_virtual(self, top):
+        self.rows.scroll_to(top)
+        self._render_virtual()
+
+    def _yview_virtual(self, *args):
+        rows = self.rows
+        if args[0] == 'moveto':
+            self._scroll_virtual(int(float(args[1]) * len(rows)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= rows.size
+            self._scroll_virtual(rows.top + step)
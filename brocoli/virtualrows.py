@@ -0,0 +1,78 @@
+"""
+Compact model of long lists of tree rows, for virtualized display
+"""
+
+
+class VirtualRows(object):
+    """
+    Holds rows (item id, text, column values and directory flag) of a long
+    listing, of which only a window of size rows starting at row top is
+    materialized as Treeview items. Selected rows are tracked here so that
+    selection survives rows leaving the window.
+    """
+    def __init__(self):
+        self.size = 1
+        self.clear()
+
+    def clear(self):
+        """
+        Forgets all rows, keeping the window size
+        """
+        self.iids = []
+        self.texts = []
+        self.values = []
+        self.isdir = bytearray()
+
+        # item id -> row index
+        self.index = {}
+
+        self.selected = set()
+
+        self.top = 0
+
+        # more rows are expected
+        self.loading = False
+
+    def __len__(self):
+        return len(self.iids)
+
+    def append(self, iid, text, values=(), isdir=False):
+        self.index[iid] = len(self.iids)
+        self.iids.append(iid)
+        self.texts.append(text)
+        self.values.append(tuple(values))
+        self.isdir.append(1 if isdir else 0)
+
+    def row(self, index):
+        return (self.iids[index], self.texts[index], self.values[index],
+                bool(self.isdir[index]))
+
+    def is_directory(self, iid):
+        """
+        Returns wether the row of item iid is a directory (False when there is
+        no such row)
+        """
+        index = self.index.get(iid)
+        return index is not None and bool(self.isdir[index])
+
+    def scroll_to(self, top):
+        """
+        Moves the window to start at row top, within bounds
+        """
+        self.top = max(0, min(top, len(self) - self.size))
+
+    def window(self):
+        """
+        Returns the item ids of the rows in the window
+        """
+        return self.iids[self.top:self.top + self.size]
+
+    def fractions(self):
+        """
+        Returns the window position as scrollbar fractions
+        """
+        if not self.iids:
+            return 0.0, 1.0
+
+        n = float(len(self))
+        return self.top / n, min(1.0, (self.top + self.size) / n)
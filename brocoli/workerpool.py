@@ -0,0 +1,159 @@
+"""
+Thread pool running generator tasks concurrently
+"""
+
+import sys
+import threading
+
+from six.moves import queue
+
+
+class WorkerPool(object):
+    """
+    Runs generator tasks in worker threads and relays the values they yield
+    to the calling thread.
+
+    Tasks are (key, func, args) tuples, func(*args) being called in a worker
+    thread and returning a generator. Tasks are pulled lazily from the tasks
+    iterable by a feeder thread, so that the iterable may perform some work
+    (like creating directories) before handing over the tasks depending on
+    it.
+
+    Iterating over the pool yields (event, key, value) tuples:
+    - (START, key, None) when a worker starts a task
+    - (YIELD, key, value) for each value yielded by a task generator
+    - (DONE, key, None) when a task generator is exhausted
+    - (ERROR, key, exc_info) when a task raised (key is None if the tasks
+      iterable itself raised)
+
+    A failed task does not stop the pool: it is up to the caller to decide
+    wether to abort (by leaving the with block) or continue.
+
+    active is an optional callable returning how many of the nworkers
+    workers may currently start new tasks, allowing to adjust concurrency
+    while the pool runs.
+    """
+    START = 0
+    YIELD = 1
+    DONE = 2
+    ERROR = 3
+
+    _EXIT = 4
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, nworkers, tasks, active=None):
+        self.nworkers = max(1, int(nworkers))
+        self.tasks = tasks
+        self.active = active
+
+        self.stop = threading.Event()
+        # set once every task was queued
+        self.fed = threading.Event()
+        self.task_queue = queue.Queue(2 * self.nworkers)
+        self.events = queue.Queue()
+        self.threads = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Interrupts running tasks and waits for the worker threads to exit
+        """
+        self.stop.set()
+
+        for t in self.threads:
+            t.join()
+
+        self.threads = []
+
+    def _put_task(self, task):
+        # enqueue task unless the pool is stopped
+        while not self.stop.is_set():
+            try:
+                self.task_queue.put(task, timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def _feed(self):
+        try:
+            for task in self.tasks:
+                if not self._put_task(task):
+                    return
+        except Exception:
+            self.events.put((self.ERROR, None, sys.exc_info()))
+        finally:
+            # workers exit once the queue is empty
+            self.fed.set()
+
+    def _run_task(self, key, func, args):
+        self.events.put((self.START, key, None))
+
+        try:
+            gen = func(*args)
+            for value in gen:
+                self.events.put((self.YIELD, key, value))
+
+                if self.stop.is_set():
+                    # interrupt generator (it may clean up after GeneratorExit)
+                    gen.close()
+                    return
+
+            self.events.put((self.DONE, key, None))
+        except Exception:
+            self.events.put((self.ERROR, key, sys.exc_info()))
+
+    def _idle(self, index):
+        # workers over the active limit wait
+        return self.active is not None and index >= self.active()
+
+    def _work(self, index):
+        try:
+            while not self.stop.is_set():
+                # no task can be queued after fed is set
+                fed = self.fed.is_set()
+
+                if self._idle(index):
+                    if fed and self.task_queue.empty():
+                        break
+
+                    self.stop.wait(self.POLL_INTERVAL)
+                    continue
+
+                try:
+                    task = self.task_queue.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    if fed:
+                        break
+                    continue
+
+                self._run_task(*task)
+        finally:
+            self.events.put((self._EXIT, None, None))
+
+    def __iter__(self):
+        threads = [threading.Thread(target=self._feed)]
+        threads += [threading.Thread(target=self._work, args=(i, ))
+                    for i in range(self.nworkers)]
+
+        for t in threads:
+            t.daemon = True
+            t.start()
+
+        self.threads = threads
+
+        running = self.nworkers
+        while running:
+            event = self.events.get()
+            if event[0] == self._EXIT:
+                running -= 1
+                continue
+
+            yield event